@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import timedelta
+import asyncio
 
-from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from app.core.security import DUMMY_PASSWORD_HASH, averify_and_update_password, aget_password_hash, create_access_token, decode_access_token
 from app.core.config import settings
 from app.repositories.user_repository import UserRepository
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
@@ -10,47 +11,61 @@ from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
 router = APIRouter()
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
+async def get_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Verified JWT claims; FastAPI resolves this once per request for every dependency below"""
+    payload = decode_access_token(credentials.credentials)
     
-    if not payload:
+    if not payload or not payload.get("sub") or not payload.get("user_id"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    username = payload.get("sub")
-    if not username:
+    return payload
+
+async def get_current_user(payload: dict = Depends(get_token_payload)):
+    # Served from the repository's short-lived user cache on repeat requests
+    user = await UserRepository.aget_user_by_username(payload["sub"])
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
+            detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = UserRepository.get_user_by_username(username)
-    if not user:
+    return user
+
+async def get_current_user_id(payload: dict = Depends(get_token_payload)) -> str:
+    """Caller's user_id straight from the verified JWT, without a database lookup"""
+    return payload["user_id"]
+
+async def get_active_user_id(payload: dict = Depends(get_token_payload)) -> str:
+    """user_id for sensitive writes, re-checking account status and token revocation"""
+    # Read past the user cache so a deactivation or revocation applies to the very next write
+    current_user = await UserRepository.aget_user_by_id_uncached(payload["user_id"])
+    
+    if not current_user or not current_user.get('is_active', True) or payload.get("rev", 0) != current_user.get('token_rev', 0):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    return current_user['user_id']
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserCreate):
     try:
         # Check if user exists
-        existing_user = UserRepository.get_user_by_email(user_data.email)
+        existing_user = await UserRepository.aget_user_by_email(user_data.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
-        existing_username = UserRepository.get_user_by_username(user_data.username)
+        existing_username = await UserRepository.aget_user_by_username(user_data.username)
         if existing_username:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,8 +73,8 @@ async def signup(user_data: UserCreate):
             )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
-        new_user = UserRepository.create_user(
+        hashed_password = await aget_password_hash(user_data.password)
+        new_user = await UserRepository.acreate_user(
             email=user_data.email,
             username=user_data.username,
             hashed_password=hashed_password,
@@ -87,15 +102,23 @@ async def signup(user_data: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
     try:
-        user = UserRepository.get_user_by_username(user_data.username)
+        user = await UserRepository.aget_user_by_username(user_data.username)
         
-        if not user or not verify_password(user_data.password, user['hashed_password']):
+        # Always run a hash check so response time doesn't reveal whether the user exists
+        hashed_password = user['hashed_password'] if user else DUMMY_PASSWORD_HASH
+        password_valid, new_hash = await averify_and_update_password(user_data.password, hashed_password)
+        
+        if not ((user is not None) & password_valid):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Upgrade legacy bcrypt hashes to the current scheme
+        if new_hash:
+            await UserRepository.aupdate_user(user['user_id'], {'hashed_password': new_hash})
+        
         if not user.get('is_active', True):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,7 +127,7 @@ async def login(user_data: UserLogin):
         
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user['username'], "user_id": user['user_id']}, 
+            data={"sub": user['username'], "user_id": user['user_id'], "rev": int(user.get('token_rev', 0))}, 
             expires_delta=access_token_expires
         )
         
@@ -129,3 +152,8 @@ async def get_me(current_user = Depends(get_current_user)):
         "is_active": current_user['is_active'],
         "created_at": current_user['created_at']
     }
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(current_user_id: str = Depends(get_active_user_id)):
+    """Sign out everywhere: every token issued before this call fails get_active_user_id"""
+    await asyncio.to_thread(UserRepository.revoke_tokens, current_user_id)
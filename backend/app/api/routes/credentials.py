@@ -1,24 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from typing import List
-from app.api.routes.auth import get_current_user
+import hmac
+from app.api.routes.auth import get_current_user_id, get_active_user_id
 from app.repositories.credential_repository import CredentialRepository
-from app.schemas.credential import CredentialCreate, CredentialResponse
-from app.core.security import encrypt_credential, decrypt_credential
+from app.schemas.credential import CredentialCreate, CredentialResponse, CREDENTIAL_LIST_ADAPTER
+from app.core.security import aencrypt_batch
 
 router = APIRouter()
 
 @router.post("/", response_model=CredentialResponse, status_code=status.HTTP_201_CREATED)
 async def create_credential(
     credential_data: CredentialCreate,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id)
 ):
-    # Encrypt credentials
-    encrypted_access_key = encrypt_credential(credential_data.access_key)
-    encrypted_secret_key = encrypt_credential(credential_data.secret_key)
+    # Encrypt both keys in one worker-thread hop
+    encrypted_access_key, encrypted_secret_key = await aencrypt_batch([credential_data.access_key, credential_data.secret_key])
     
     # Create credential
     credential = CredentialRepository.create_credential(
-        user_id=current_user['user_id'],
+        user_id=current_user_id,
         credential_name=credential_data.credential_name,
         encrypted_access_key=encrypted_access_key,
         encrypted_secret_key=encrypted_secret_key
@@ -32,10 +32,11 @@ async def create_credential(
     }
 
 @router.get("/", response_model=List[CredentialResponse])
-async def list_credentials(current_user = Depends(get_current_user)):
-    credentials = CredentialRepository.get_user_credentials(current_user['user_id'])
+async def list_credentials(current_user_id: str = Depends(get_current_user_id)):
+    credentials = CredentialRepository.get_user_credentials(current_user_id)
     
-    return [
+    # Validate the list in one pass and serialize it directly, skipping per-item revalidation
+    items = CREDENTIAL_LIST_ADAPTER.validate_python([
         {
             "id": cred['credential_id'],
             "credential_name": cred['credential_name'],
@@ -43,16 +44,17 @@ async def list_credentials(current_user = Depends(get_current_user)):
             "created_at": cred['created_at']
         }
         for cred in credentials
-    ]
+    ])
+    return Response(content=CREDENTIAL_LIST_ADAPTER.dump_json(items), media_type="application/json")
 
 @router.get("/{credential_id}", response_model=CredentialResponse)
 async def get_credential(
     credential_id: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     credential = CredentialRepository.get_credential_by_id(credential_id)
     
-    if not credential or credential['user_id'] != current_user['user_id']:
+    if not credential or not hmac.compare_digest(credential['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Credential not found"
@@ -68,15 +70,15 @@ async def get_credential(
 @router.delete("/{credential_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_credential(
     credential_id: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id)
 ):
     credential = CredentialRepository.get_credential_by_id(credential_id)
     
-    if not credential or credential['user_id'] != current_user['user_id']:
+    if not credential or not hmac.compare_digest(credential['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Credential not found"
         )
     
-    CredentialRepository.delete_credential(current_user['user_id'], credential_id)
+    CredentialRepository.delete_credential(current_user_id, credential_id)
     return None
@@ -1,20 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_user_id
 from app.repositories.scan_repository import ScanRepository
-from app.services.report_service import generate_pdf_report, generate_excel_report
-import io
+from app.repositories.scan_results_repository import ScanResultsRepository
+from cachetools import LRUCache
+import asyncio
+import hmac
 
 router = APIRouter()
 
+# Prepared report views keyed by scan and last update; a PDF and an Excel
+# download of the same scan hydrate and flatten the results only once
+_report_views = LRUCache(maxsize=64)
+
+async def _get_report_view(scan: dict):
+    from app.services.report_service import prepare_report_view
+    
+    key = (scan['scan_id'], scan.get('updated_at'))
+    view = _report_views.get(key)
+    if view is None:
+        hydrated = await asyncio.to_thread(ScanResultsRepository.hydrate_for_report, scan)
+        view = _report_views[key] = prepare_report_view(hydrated)
+    return view
+
 @router.get("/{scan_id}/pdf")
 async def download_pdf_report(
     scan_id: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     scan = ScanRepository.get_scan_by_id(scan_id)
     
-    if not scan or scan['user_id'] != current_user['user_id']:
+    if not scan or not hmac.compare_digest(scan['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Scan not found"
@@ -26,11 +42,12 @@ async def download_pdf_report(
             detail="Scan not completed yet"
         )
     
-    # Generate PDF
-    pdf_buffer = generate_pdf_report(scan)
+    view = await _get_report_view(scan)
+    
+    from app.services.report_service import generate_pdf_report, stream_report
     
     return StreamingResponse(
-        io.BytesIO(pdf_buffer),
+        stream_report(generate_pdf_report, view),
         media_type="application/pdf",
         headers={
             "Content-Disposition": f"attachment; filename=wellarchitected_report_{scan_id}.pdf"
@@ -40,11 +57,11 @@ async def download_pdf_report(
 @router.get("/{scan_id}/excel")
 async def download_excel_report(
     scan_id: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     scan = ScanRepository.get_scan_by_id(scan_id)
     
-    if not scan or scan['user_id'] != current_user['user_id']:
+    if not scan or not hmac.compare_digest(scan['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Scan not found"
@@ -56,11 +73,12 @@ async def download_excel_report(
             detail="Scan not completed yet"
         )
     
-    # Generate Excel
-    excel_buffer = generate_excel_report(scan)
+    view = await _get_report_view(scan)
+    
+    from app.services.report_service import generate_excel_report, stream_report
     
     return StreamingResponse(
-        io.BytesIO(excel_buffer),
+        stream_report(generate_excel_report, view),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={
             "Content-Disposition": f"attachment; filename=wellarchitected_report_{scan_id}.xlsx"
@@ -1,40 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from app.api.routes.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
+from app.api.routes.auth import get_current_user_id, get_active_user_id
 from app.core.config import settings
-import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-s3_client = boto3.client('s3', region_name=settings.AWS_REGION)
+ALLOWED_EXTENSIONS = frozenset({'.pdf', '.txt', '.md', '.docx'})
+
+# Multipart uploads with concurrent parts for large documents; aioboto3 runs the
+# parts as coroutines, so only the size and concurrency settings apply
+TRANSFER_CFG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+)
+
+def get_s3_client(request: Request):
+    """Async S3 client opened in the application lifespan"""
+    return request.app.state.s3
 
 @router.post("/upload-document")
 async def upload_document(
     file: UploadFile = File(...),
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id),
+    s3_client = Depends(get_s3_client)
 ):
     """Upload Well-Architected Framework documents to S3"""
     try:
-        # Validate file type
-        allowed_extensions = ['.pdf', '.txt', '.md', '.docx']
-        file_ext = file.filename[file.filename.rfind('.'):]
+        # Validate file type (case-insensitive)
+        file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
+                detail=f"File type not allowed. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
             )
         
         # Upload to S3
-        file_key = f"documents/{current_user['user_id']}/{file.filename}"
+        file_key = f"documents/{current_user_id}/{file.filename}"
         
-        s3_client.upload_fileobj(
+        await s3_client.upload_fileobj(
             file.file,
             settings.S3_DOCS_BUCKET,
             file_key,
-            ExtraArgs={'ContentType': file.content_type}
+            ExtraArgs={'ContentType': file.content_type},
+            Config=TRANSFER_CFG
         )
         
         return {
@@ -52,24 +66,31 @@ async def upload_document(
         )
 
 @router.get("/documents")
-async def list_documents(current_user = Depends(get_current_user)):
-    """List uploaded documents"""
+async def list_documents(
+    iso_timestamps: bool = False,
+    current_user_id: str = Depends(get_current_user_id),
+    s3_client = Depends(get_s3_client)
+):
+    """List uploaded documents (last_modified is epoch seconds unless iso_timestamps is set)"""
     try:
-        prefix = f"documents/{current_user['user_id']}/"
-        
-        response = s3_client.list_objects_v2(
-            Bucket=settings.S3_DOCS_BUCKET,
-            Prefix=prefix
-        )
+        prefix = f"documents/{current_user_id}/"
         
+        paginator = s3_client.get_paginator('list_objects_v2')
         documents = []
-        for obj in response.get('Contents', []):
-            documents.append({
-                "file_name": obj['Key'].split('/')[-1],
-                "size": obj['Size'],
-                "last_modified": obj['LastModified'].isoformat(),
-                "s3_key": obj['Key']
-            })
+        async for page in paginator.paginate(
+            Bucket=settings.S3_DOCS_BUCKET,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': 1000}
+        ):
+            documents.extend(
+                {
+                    "file_name": obj['Key'].rsplit('/', 1)[-1],
+                    "size": obj['Size'],
+                    "last_modified": obj['LastModified'].isoformat() if iso_timestamps else obj['LastModified'].timestamp(),
+                    "s3_key": obj['Key']
+                }
+                for obj in page.get('Contents', [])
+            )
         
         return {"documents": documents}
         
@@ -83,13 +104,14 @@ async def list_documents(current_user = Depends(get_current_user)):
 @router.delete("/documents/{file_name}")
 async def delete_document(
     file_name: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id),
+    s3_client = Depends(get_s3_client)
 ):
     """Delete a document from S3"""
     try:
-        file_key = f"documents/{current_user['user_id']}/{file_name}"
+        file_key = f"documents/{current_user_id}/{file_name}"
         
-        s3_client.delete_object(
+        await s3_client.delete_object(
             Bucket=settings.S3_DOCS_BUCKET,
             Key=file_key
         )
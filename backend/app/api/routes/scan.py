@@ -1,24 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import List
-from app.api.routes.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Response, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List
+from app.api.routes.auth import get_current_user_id, get_active_user_id
 from app.repositories.scan_repository import ScanRepository
 from app.repositories.credential_repository import CredentialRepository
-from app.schemas.scan import ScanCreate, ScanResponse, ScanDetailResponse
-from app.services.aws_scanner import AWSScanner
-from app.services.bedrock_service import bedrock_service
-from app.core.security import decrypt_credential
+from app.repositories.scan_results_repository import ScanResultsRepository
+from app.schemas.scan import ScanCreate, ScanResponse, ScanDetailResponse, SCAN_LIST_ADAPTER
+from app.core.security import decrypt_credential_cached
+import asyncio
+import hmac
+import orjson
 import logging
+import time
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between progress writes during a scan
+PROGRESS_UPDATE_INTERVAL = 1.0
+
+async def scan_all_regions(scanner, user_id: str, scan_id: str, regions: List[str]) -> dict:
+    """Scan regions concurrently, storing each as it finishes and recording progress at most once per interval"""
+    from app.services.aws_scanner import GLOBAL_SERVICES_REGION
+    
+    # Global services run once, alongside the regional scans, and are reported under their home region
+    global_scan = asyncio.create_task(scanner.scan_global()) if GLOBAL_SERVICES_REGION in regions else None
+    
+    async def scan_and_store(region: str) -> tuple:
+        region_results = await scanner.scan_region(region)
+        if region == GLOBAL_SERVICES_REGION:
+            region_results.update(await global_scan)
+        await asyncio.to_thread(ScanResultsRepository.put_region_results, user_id, scan_id, region, region_results)
+        return region, region_results
+    
+    all_results = {}
+    last_update = 0.0
+    for idx, task in enumerate(asyncio.as_completed([scan_and_store(region) for region in regions])):
+        region, region_results = await task
+        logger.info(f"Scanned region: {region}")
+        all_results[region] = region_results
+        
+        now = time.monotonic()
+        if now - last_update < PROGRESS_UPDATE_INTERVAL and idx < len(regions) - 1:
+            continue
+        
+        # Update progress
+        progress = int(((idx + 1) / len(regions)) * 80)  # 80% for scanning
+        await asyncio.to_thread(ScanRepository.update_scan, user_id, scan_id, {
+            'progress': progress,
+            'regions_scanned': list(all_results.keys())
+        })
+        last_update = now
+    
+    return all_results
+
 def perform_scan(scan_id: str, user_id: str, credential_id: str, regions: List[str] = None):
     """Background task to perform AWS scan"""
+    from app.services.aws_scanner import AWSScanner
+    
     try:
-        # Update scan status to running
+        # Update scan status to running; region results are stored in S3 under results_prefix
         ScanRepository.update_scan(user_id, scan_id, {
             'status': 'running',
-            'started_at': None  # Will be set by DynamoDB
+            'started_at': None,  # Will be set by DynamoDB
+            'results_prefix': ScanResultsRepository.results_prefix(user_id, scan_id)
         })
         
         # Get credentials
@@ -27,38 +72,31 @@ def perform_scan(scan_id: str, user_id: str, credential_id: str, regions: List[s
             raise Exception("Credential not found")
         
         # Decrypt credentials
-        access_key = decrypt_credential(credential['encrypted_access_key'])
-        secret_key = decrypt_credential(credential['encrypted_secret_key'])
+        access_key, secret_key = decrypt_credential_cached(
+            credential_id,
+            credential.get('updated_at', ''),
+            credential['encrypted_access_key'],
+            credential['encrypted_secret_key'],
+        )
         
         # Initialize scanner
         scanner = AWSScanner(access_key, secret_key)
         
-        # Get regions to scan
+        # Get regions to scan, dropping any the account has not enabled
+        regions = asyncio.run(scanner.resolve_regions(regions))
         if not regions:
-            regions = scanner.get_all_regions()
+            raise Exception("None of the requested regions are enabled for this account")
         
-        # Scan each region
-        all_results = {}
-        for idx, region in enumerate(regions):
-            logger.info(f"Scanning region: {region}")
-            region_results = scanner.scan_region(region)
-            all_results[region] = region_results
-            
-            # Update progress
-            progress = int(((idx + 1) / len(regions)) * 80)  # 80% for scanning
-            ScanRepository.update_scan(user_id, scan_id, {
-                'progress': progress,
-                'regions_scanned': list(all_results.keys()),
-                'results': all_results
-            })
+        # Runs in the background worker thread, so it gets its own event loop
+        all_results = asyncio.run(scan_all_regions(scanner, user_id, scan_id, regions))
         
         # Generate AI recommendations using multi-agent system
         logger.info("Generating AI recommendations with specialized agents")
         ScanRepository.update_scan(user_id, scan_id, {'progress': 85})
         
         # Use multi-agent system for comprehensive assessment
-        from app.services.bedrock_agents_service import bedrock_agents_service
-        comprehensive_assessment = bedrock_agents_service.comprehensive_assessment(all_results)
+        from app.services.bedrock_agents_service import get_bedrock_agents_service, format_pillar_analysis
+        comprehensive_assessment = get_bedrock_agents_service().comprehensive_assessment(all_results)
         
         # Format recommendations
         ai_recommendations = f"""EXECUTIVE SUMMARY:
@@ -67,13 +105,22 @@ def perform_scan(scan_id: str, user_id: str, credential_id: str, regions: List[s
 PILLAR ASSESSMENTS:
 """
         for pillar, assessment in comprehensive_assessment['pillar_assessments'].items():
-            ai_recommendations += f"\n\n{pillar.upper().replace('_', ' ')}:\n{assessment.get('analysis', 'N/A')}\n"
+            analysis = format_pillar_analysis(assessment['analysis']) if 'analysis' in assessment else 'N/A'
+            ai_recommendations += f"\n\n{pillar.upper().replace('_', ' ')}:\n{analysis}\n"
         
         # Update scan as completed
+        ai_recommendations_key = ScanResultsRepository.put_ai_recommendations(user_id, scan_id, ai_recommendations)
+        
+        # Split once here so report generation never re-parses the text
+        from app.services.report_service import split_recommendation_blocks
+        ai_recommendations_blocks_key = ScanResultsRepository.put_ai_recommendations_blocks(
+            user_id, scan_id, split_recommendation_blocks(ai_recommendations)
+        )
         ScanRepository.update_scan(user_id, scan_id, {
             'status': 'completed',
             'progress': 100,
-            'ai_recommendations': ai_recommendations,
+            'ai_recommendations_key': ai_recommendations_key,
+            'ai_recommendations_blocks_key': ai_recommendations_blocks_key,
             'completed_at': None  # Will be set by DynamoDB
         })
         
@@ -90,11 +137,11 @@ PILLAR ASSESSMENTS:
 async def create_scan(
     scan_data: ScanCreate,
     background_tasks: BackgroundTasks,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id)
 ):
     # Verify credential belongs to user
     credential = CredentialRepository.get_credential_by_id(scan_data.credential_id)
-    if not credential or credential['user_id'] != current_user['user_id']:
+    if not credential or not hmac.compare_digest(credential['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Credential not found"
@@ -102,7 +149,7 @@ async def create_scan(
     
     # Create scan
     scan = ScanRepository.create_scan(
-        user_id=current_user['user_id'],
+        user_id=current_user_id,
         credential_id=scan_data.credential_id,
         scan_name=scan_data.scan_name
     )
@@ -111,7 +158,7 @@ async def create_scan(
     background_tasks.add_task(
         perform_scan,
         scan['scan_id'],
-        current_user['user_id'],
+        current_user_id,
         scan_data.credential_id,
         scan_data.regions
     )
@@ -128,10 +175,12 @@ async def create_scan(
     }
 
 @router.get("/", response_model=List[ScanResponse])
-async def list_scans(current_user = Depends(get_current_user)):
-    scans = ScanRepository.get_user_scans(current_user['user_id'])
+async def list_scans(current_user_id: str = Depends(get_current_user_id)):
+    # Already newest-first from the time-ordered sort key
+    scans = ScanRepository.get_user_scans(current_user_id)
     
-    return [
+    # Validate the list in one pass and serialize it directly, skipping per-item revalidation
+    items = SCAN_LIST_ADAPTER.validate_python([
         {
             "id": scan['scan_id'],
             "scan_name": scan['scan_name'],
@@ -142,22 +191,63 @@ async def list_scans(current_user = Depends(get_current_user)):
             "completed_at": scan.get('completed_at'),
             "created_at": scan['created_at']
         }
-        for scan in sorted(scans, key=lambda x: x['created_at'], reverse=True)
-    ]
+        for scan in scans
+    ])
+    return Response(content=SCAN_LIST_ADAPTER.dump_json(items), media_type="application/json")
+
+@router.get("/analyze/stream")
+async def stream_scan_analysis(
+    scan_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Stream a Claude analysis of a completed scan as server-sent events"""
+    scan = ScanRepository.get_scan_by_id(scan_id)
+    
+    if not scan or not hmac.compare_digest(scan['user_id'], current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scan not found"
+        )
+    
+    if scan['status'] != 'completed':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Scan not completed yet"
+        )
+    
+    results = await asyncio.to_thread(ScanResultsRepository.get_results, scan)
+    
+    from app.services.bedrock_service import bedrock_service
+    
+    async def events() -> AsyncIterator[bytes]:
+        # Each delta is JSON-encoded so newlines in the text survive SSE framing
+        async for text in bedrock_service.astream_scan_analysis(results):
+            yield b"data: " + orjson.dumps(text) + b"\n\n"
+        yield b"event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @router.get("/{scan_id}", response_model=ScanDetailResponse)
 async def get_scan(
     scan_id: str,
-    current_user = Depends(get_current_user)
+    include_results: bool = True,
+    current_user_id: str = Depends(get_current_user_id)
 ):
     scan = ScanRepository.get_scan_by_id(scan_id)
     
-    if not scan or scan['user_id'] != current_user['user_id']:
+    if not scan or not hmac.compare_digest(scan['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Scan not found"
         )
     
+    # Results and recommendations live in S3; only fetch them when asked and once
+    # the scan has finished, so the detail page's progress polling stays cheap
+    if include_results and scan['status'] == 'completed':
+        scan = await asyncio.to_thread(ScanResultsRepository.hydrate, scan)
+    else:
+        scan = {**scan, 'results': None, 'ai_recommendations': None}
+    
     return {
         "id": scan['scan_id'],
         "scan_name": scan['scan_name'],
@@ -175,15 +265,16 @@ async def get_scan(
 @router.delete("/{scan_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_scan(
     scan_id: str,
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_active_user_id)
 ):
     scan = ScanRepository.get_scan_by_id(scan_id)
     
-    if not scan or scan['user_id'] != current_user['user_id']:
+    if not scan or not hmac.compare_digest(scan['user_id'], current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Scan not found"
         )
     
-    ScanRepository.delete_scan(current_user['user_id'], scan_id)
+    ScanRepository.delete_scan(current_user_id, scan_id)
+    ScanResultsRepository.delete_scan_results(current_user_id, scan_id)
     return None
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from botocore.config import Config
 from typing import List
 import os
 
@@ -24,6 +25,12 @@ class Settings(BaseSettings):
     S3_DOCS_BUCKET: str = ""
     S3_REPORTS_BUCKET: str = ""
     
+    # Redis / ElastiCache (list caching is disabled when empty)
+    REDIS_URL: str = ""
+    
+    # Reports (0 renders in a thread of the API process instead of a process pool)
+    REPORT_RENDER_WORKERS: int = min(4, os.cpu_count() or 1)
+    
     # Security
     SECRET_KEY: str
     ENCRYPTION_KEY: str
@@ -37,3 +44,10 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 settings = Settings()
+
+# Shared by long-lived boto3 clients: keep pooled sockets warm and back off under throttling
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+)
@@ -1,18 +1,52 @@
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import List, Optional, Tuple, Union
+import asyncio
+import base64
+import hashlib
+import os
+import time
+from cachetools import TTLCache
+import jwt
 from passlib.context import CryptContext
 from cryptography.fernet import Fernet
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use Argon2id; existing bcrypt hashes still verify and are upgraded on login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__memory_cost=64 * 1024,
+    argon2__time_cost=3,
+    argon2__parallelism=max(1, (os.cpu_count() or 1) // 2),
+)
+
+# Decoded JWT payloads keyed by a truncated SHA-256 of the token (never the raw token)
+_token_cache = TTLCache(maxsize=10000, ttl=30)
+
+# Verified against when a login names an unknown user, so both paths cost one hash check
+DUMMY_PASSWORD_HASH = pwd_context.hash("dummy-password")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a replacement hash if the stored one is outdated"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# Async shims so CPU-bound hashing does not block the event loop in async routes
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await asyncio.to_thread(verify_and_update_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    return await asyncio.to_thread(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -24,20 +58,73 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    payload = _token_cache.get(key)
+    if payload is not None:
+        # Cached entries must never outlive the token's own expiry
+        if payload.get("exp", 0) > time.time():
+            return payload
+        _token_cache.pop(key, None)
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        return payload
-    except JWTError:
+    except jwt.InvalidTokenError:
         return None
+    
+    # Invalid tokens are never cached
+    if payload.get("exp", 0) > time.time():
+        _token_cache[key] = payload
+    return payload
 
-# Encryption for AWS credentials
-def get_cipher():
-    return Fernet(settings.ENCRYPTION_KEY.encode())
+# Encryption for AWS credentials (Fernet instances are safe to share across threads)
+_CIPHER = Fernet(settings.ENCRYPTION_KEY.encode())
 
 def encrypt_credential(credential: str) -> str:
-    cipher = get_cipher()
-    return cipher.encrypt(credential.encode()).decode()
+    return _CIPHER.encrypt(credential.encode()).decode()
 
 def decrypt_credential(encrypted_credential: str) -> str:
-    cipher = get_cipher()
-    return cipher.decrypt(encrypted_credential.encode()).decode()
+    return _CIPHER.decrypt(encrypted_credential.encode()).decode()
+
+# Decrypted (access_key, secret_key) pairs keyed by credential_id; process-local, never persisted
+_cred_cache = TTLCache(maxsize=1024, ttl=300)
+
+def decrypt_credential_cached(credential_id: str, version: str, encrypted_access_key: Union[str, bytes], encrypted_secret_key: Union[str, bytes]) -> Tuple[str, str]:
+    """Decrypt a credential pair, reusing the plaintext while the stored version is unchanged"""
+    cached = _cred_cache.get(credential_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    keys = tuple(decrypt_batch([encrypted_access_key, encrypted_secret_key]))
+    _cred_cache[credential_id] = (version, keys)
+    return keys
+
+def invalidate_cached_credential(credential_id: str) -> None:
+    _cred_cache.pop(credential_id, None)
+
+# Bytes-native variants store the raw Fernet token (one base64 layer fewer) as DynamoDB Binary
+def encrypt_credential_b(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(_CIPHER.encrypt(data))
+
+def decrypt_credential_b(token: bytes) -> bytes:
+    return _CIPHER.decrypt(base64.urlsafe_b64encode(token))
+
+def _decrypt_stored(value: Union[str, bytes]) -> bytes:
+    """Plaintext of a stored value: legacy base64 string or raw binary"""
+    if isinstance(value, str):
+        return _CIPHER.decrypt(value.encode())
+    return decrypt_credential_b(bytes(value))
+
+def encrypt_batch(items: List[str]) -> List[bytes]:
+    """Raw tokens for several values, ready to store as DynamoDB Binary"""
+    return [encrypt_credential_b(item.encode()) for item in items]
+
+def decrypt_batch(items: List[Union[str, bytes]]) -> List[str]:
+    return [_decrypt_stored(item).decode() for item in items]
+
+async def aencrypt_credential(credential: str) -> str:
+    return await asyncio.to_thread(encrypt_credential, credential)
+
+async def adecrypt_credential(encrypted_credential: str) -> str:
+    return await asyncio.to_thread(decrypt_credential, encrypted_credential)
+
+async def aencrypt_batch(items: List[str]) -> List[bytes]:
+    return await asyncio.to_thread(encrypt_batch, items)
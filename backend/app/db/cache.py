@@ -0,0 +1,57 @@
+import redis
+import orjson
+from decimal import Decimal
+from typing import Any, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lists cached in front of DynamoDB are short-lived; writes also delete them
+LIST_CACHE_TTL = 30
+
+def _default(value: Any) -> Any:
+    """orjson fallback for DynamoDB number types"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError
+
+class RedisCache:
+    """Lazy-loading cache for hot DynamoDB reads; a no-op when REDIS_URL is unset"""
+    
+    def __init__(self):
+        self.client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5,
+        ) if settings.REDIS_URL else None
+    
+    def get_json(self, key: str) -> Optional[Any]:
+        """Cached value, or None on a miss or when Redis is unavailable"""
+        if self.client is None:
+            return None
+        try:
+            cached = self.client.get(key)
+            return orjson.loads(cached) if cached is not None else None
+        except redis.RedisError as e:
+            logger.error(f"Error reading cache key {key}: {e}")
+            return None
+    
+    def set_json(self, key: str, value: Any, ttl: int = LIST_CACHE_TTL) -> None:
+        if self.client is None:
+            return
+        try:
+            self.client.setex(key, ttl, orjson.dumps(value, default=_default))
+        except redis.RedisError as e:
+            logger.error(f"Error writing cache key {key}: {e}")
+    
+    def delete(self, *keys: str) -> None:
+        if self.client is None or not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except redis.RedisError as e:
+            logger.error(f"Error deleting cache keys {keys}: {e}")
+
+# Singleton instance
+cache_client = RedisCache()
@@ -1,18 +1,54 @@
 import boto3
+from app.core.config import boto_config
+import asyncio
 from botocore.exceptions import ClientError
 from typing import Optional, Dict, List, Any
+from contextlib import AsyncExitStack
 from datetime import datetime
+import time
 import uuid
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (epoch second, formatted prefix) of the most recent iso_now call
+_iso_second = (0, '')
+
+def iso_now() -> str:
+    """Current UTC time as ISO 8601 with microseconds, reusing the formatted second between calls"""
+    global _iso_second
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix = _iso_second
+    if seconds != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+        _iso_second = (seconds, prefix)
+    return f"{prefix}.{nanos // 1000:06d}"
+
+def _build_update_expression(updates: Dict) -> Dict[str, Any]:
+    """Build SET expression arguments; every key is a top-level attribute name, taken literally"""
+    return {
+        'UpdateExpression': "SET " + ", ".join(f"#n{i} = :v{i}" for i in range(len(updates))),
+        'ExpressionAttributeNames': {f"#n{i}": key for i, key in enumerate(updates)},
+        'ExpressionAttributeValues': {f":v{i}": value for i, value in enumerate(updates.values())},
+    }
+
 class DynamoDBClient:
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_REGION', 'ap-southeast-1'))
+        self.dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_REGION', 'ap-southeast-1'), config=boto_config)
         self.table_name = os.getenv('DYNAMODB_TABLE_NAME', 'WellArchitectedApp')
         self.table = self.dynamodb.Table(self.table_name)
+        self.async_table = None
+    
+    async def connect_async(self, session, stack: AsyncExitStack) -> None:
+        """Open an aioboto3 table handle for use from async routes"""
+        resource = await stack.enter_async_context(
+            session.resource('dynamodb', region_name=os.getenv('AWS_REGION', 'ap-southeast-1'))
+        )
+        self.async_table = await resource.Table(self.table_name)
+    
+    def disconnect_async(self) -> None:
+        self.async_table = None
     
     def put_item(self, item: Dict) -> bool:
         """Insert or update an item"""
@@ -23,6 +59,17 @@ class DynamoDBClient:
             logger.error(f"Error putting item: {e}")
             return False
     
+    def batch_put_items(self, items: List[Dict]) -> bool:
+        """Insert items 25 per request; unprocessed items are retried by the batch writer"""
+        try:
+            with self.table.batch_writer() as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+            return True
+        except ClientError as e:
+            logger.error(f"Error batch putting items: {e}")
+            return False
+    
     def get_item(self, pk: str, sk: str) -> Optional[Dict]:
         """Get an item by primary key"""
         try:
@@ -32,38 +79,50 @@ class DynamoDBClient:
             logger.error(f"Error getting item: {e}")
             return None
     
-    def query_by_pk(self, pk: str, sk_prefix: Optional[str] = None) -> List[Dict]:
-        """Query items by partition key"""
+    def query_by_pk(self, pk: str, sk_prefix: Optional[str] = None, scan_forward: bool = True, limit: Optional[int] = None) -> List[Dict]:
+        """Query items by partition key, ordered by sort key"""
         try:
+            kwargs: Dict[str, Any] = {'ScanIndexForward': scan_forward}
+            if limit:
+                kwargs['Limit'] = limit
+            
             if sk_prefix:
                 response = self.table.query(
                     KeyConditionExpression='PK = :pk AND begins_with(SK, :sk)',
-                    ExpressionAttributeValues={':pk': pk, ':sk': sk_prefix}
+                    ExpressionAttributeValues={':pk': pk, ':sk': sk_prefix},
+                    **kwargs
                 )
             else:
                 response = self.table.query(
                     KeyConditionExpression='PK = :pk',
-                    ExpressionAttributeValues={':pk': pk}
+                    ExpressionAttributeValues={':pk': pk},
+                    **kwargs
                 )
             return response.get('Items', [])
         except ClientError as e:
             logger.error(f"Error querying items: {e}")
             return []
     
-    def query_gsi(self, gsi_name: str, gsi_pk: str, gsi_sk: Optional[str] = None) -> List[Dict]:
-        """Query items using GSI"""
+    def query_gsi(self, gsi_name: str, gsi_pk: str, gsi_sk: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Query items using GSI (key attributes are named <gsi_name>PK / <gsi_name>SK)"""
         try:
+            kwargs: Dict[str, Any] = {}
+            if limit:
+                kwargs['Limit'] = limit
+            
             if gsi_sk:
                 response = self.table.query(
                     IndexName=gsi_name,
-                    KeyConditionExpression='GSI1PK = :pk AND GSI1SK = :sk',
-                    ExpressionAttributeValues={':pk': gsi_pk, ':sk': gsi_sk}
+                    KeyConditionExpression=f'{gsi_name}PK = :pk AND {gsi_name}SK = :sk',
+                    ExpressionAttributeValues={':pk': gsi_pk, ':sk': gsi_sk},
+                    **kwargs
                 )
             else:
                 response = self.table.query(
                     IndexName=gsi_name,
-                    KeyConditionExpression='GSI1PK = :pk',
-                    ExpressionAttributeValues={':pk': gsi_pk}
+                    KeyConditionExpression=f'{gsi_name}PK = :pk',
+                    ExpressionAttributeValues={':pk': gsi_pk},
+                    **kwargs
                 )
             return response.get('Items', [])
         except ClientError as e:
@@ -73,15 +132,88 @@ class DynamoDBClient:
     def update_item(self, pk: str, sk: str, updates: Dict) -> bool:
         """Update specific attributes of an item"""
         try:
-            update_expression = "SET " + ", ".join([f"#{k} = :{k}" for k in updates.keys()])
-            expression_attribute_names = {f"#{k}": k for k in updates.keys()}
-            expression_attribute_values = {f":{k}": v for k, v in updates.items()}
+            self.table.update_item(
+                Key={'PK': pk, 'SK': sk},
+                **_build_update_expression(updates)
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Error updating item: {e}")
+            return False
+    
+    def increment_item(self, pk: str, sk: str, attribute: str, updates: Optional[Dict] = None) -> bool:
+        """Atomically add 1 to a numeric attribute (starting from 0 when absent), setting updates in the same write"""
+        try:
+            names = {'#inc': attribute}
+            values: Dict[str, Any] = {':inc': 1}
+            expression = 'ADD #inc :inc'
+            if updates:
+                update = _build_update_expression(updates)
+                expression = f"{update['UpdateExpression']} {expression}"
+                names.update(update['ExpressionAttributeNames'])
+                values.update(update['ExpressionAttributeValues'])
             
             self.table.update_item(
                 Key={'PK': pk, 'SK': sk},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values
+                UpdateExpression=expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Error incrementing item: {e}")
+            return False
+    
+    async def aput_item(self, item: Dict) -> bool:
+        """Insert or update an item without blocking the event loop"""
+        if self.async_table is None:
+            return await asyncio.to_thread(self.put_item, item)
+        try:
+            await self.async_table.put_item(Item=item)
+            return True
+        except ClientError as e:
+            logger.error(f"Error putting item: {e}")
+            return False
+    
+    async def aget_item(self, pk: str, sk: str) -> Optional[Dict]:
+        """Get an item by primary key without blocking the event loop"""
+        if self.async_table is None:
+            return await asyncio.to_thread(self.get_item, pk, sk)
+        try:
+            response = await self.async_table.get_item(Key={'PK': pk, 'SK': sk})
+            return response.get('Item')
+        except ClientError as e:
+            logger.error(f"Error getting item: {e}")
+            return None
+    
+    async def aquery_gsi(self, gsi_name: str, gsi_pk: str, limit: Optional[int] = None) -> List[Dict]:
+        """Query items using GSI without blocking the event loop"""
+        if self.async_table is None:
+            return await asyncio.to_thread(self.query_gsi, gsi_name, gsi_pk, None, limit)
+        try:
+            kwargs: Dict[str, Any] = {}
+            if limit:
+                kwargs['Limit'] = limit
+            
+            response = await self.async_table.query(
+                IndexName=gsi_name,
+                KeyConditionExpression=f'{gsi_name}PK = :pk',
+                ExpressionAttributeValues={':pk': gsi_pk},
+                **kwargs
+            )
+            return response.get('Items', [])
+        except ClientError as e:
+            logger.error(f"Error querying GSI: {e}")
+            return []
+    
+    async def aupdate_item(self, pk: str, sk: str, updates: Dict) -> bool:
+        """Update specific attributes of an item without blocking the event loop"""
+        if self.async_table is None:
+            return await asyncio.to_thread(self.update_item, pk, sk, updates)
+        try:
+            await self.async_table.update_item(
+                Key={'PK': pk, 'SK': sk},
+                **_build_update_expression(updates)
             )
             return True
         except ClientError as e:
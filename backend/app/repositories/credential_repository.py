@@ -1,15 +1,22 @@
 from typing import Optional, Dict, List
-from datetime import datetime
 import uuid
-from app.db.dynamodb import db_client
+from app.db.dynamodb import db_client, iso_now
+from app.db.cache import cache_client
+from app.core.security import invalidate_cached_credential
+
+# Secret material never goes into the shared list cache
+_SECRET_FIELDS = ('encrypted_access_key', 'encrypted_secret_key')
+
+def _credentials_cache_key(user_id: str) -> str:
+    return f"creds:{user_id}"
 
 class CredentialRepository:
     @staticmethod
-    def create_credential(user_id: str, credential_name: str, encrypted_access_key: str, encrypted_secret_key: str) -> Dict:
-        cred_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
+    def _build_credential_item(user_id: str, credential_name: str, encrypted_access_key: bytes, encrypted_secret_key: bytes) -> Dict:
+        cred_id = uuid.uuid4().hex
+        timestamp = iso_now()
         
-        cred_item = {
+        return {
             'PK': f'USER#{user_id}',
             'SK': f'CRED#{cred_id}',
             'GSI1PK': f'CRED#{cred_id}',
@@ -23,24 +30,49 @@ class CredentialRepository:
             'created_at': timestamp,
             'updated_at': timestamp,
         }
-        
+    
+    @staticmethod
+    def create_credential(user_id: str, credential_name: str, encrypted_access_key: bytes, encrypted_secret_key: bytes) -> Dict:
+        cred_item = CredentialRepository._build_credential_item(user_id, credential_name, encrypted_access_key, encrypted_secret_key)
         db_client.put_item(cred_item)
+        cache_client.delete(_credentials_cache_key(user_id))
         return cred_item
     
+    @staticmethod
+    def bulk_create_credentials(credentials: List[Dict]) -> List[Dict]:
+        """Create many credentials in batched writes; each dict holds create_credential's arguments"""
+        cred_items = [CredentialRepository._build_credential_item(**cred) for cred in credentials]
+        db_client.batch_put_items(cred_items)
+        cache_client.delete(*{_credentials_cache_key(item['user_id']) for item in cred_items})
+        return cred_items
+    
     @staticmethod
     def get_credential_by_id(cred_id: str) -> Optional[Dict]:
-        items = db_client.query_gsi('GSI1', f'CRED#{cred_id}')
+        items = db_client.query_gsi('GSI1', f'CRED#{cred_id}', limit=1)
         return items[0] if items else None
     
     @staticmethod
     def get_user_credentials(user_id: str) -> List[Dict]:
-        return db_client.query_by_pk(f'USER#{user_id}', 'CRED#')
+        """Credential summaries for a user, without the encrypted keys"""
+        key = _credentials_cache_key(user_id)
+        credentials = cache_client.get_json(key)
+        if credentials is None:
+            credentials = [
+                {k: v for k, v in item.items() if k not in _SECRET_FIELDS}
+                for item in db_client.query_by_pk(f'USER#{user_id}', 'CRED#')
+            ]
+            cache_client.set_json(key, credentials)
+        return credentials
     
     @staticmethod
     def update_credential(user_id: str, cred_id: str, updates: Dict) -> bool:
-        updates['updated_at'] = datetime.utcnow().isoformat()
+        updates['updated_at'] = iso_now()
+        invalidate_cached_credential(cred_id)
+        cache_client.delete(_credentials_cache_key(user_id))
         return db_client.update_item(f'USER#{user_id}', f'CRED#{cred_id}', updates)
     
     @staticmethod
     def delete_credential(user_id: str, cred_id: str) -> bool:
+        invalidate_cached_credential(cred_id)
+        cache_client.delete(_credentials_cache_key(user_id))
         return db_client.delete_item(f'USER#{user_id}', f'CRED#{cred_id}')
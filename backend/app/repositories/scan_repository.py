@@ -1,17 +1,33 @@
 from typing import Optional, Dict, List
-from datetime import datetime
+import time
 import uuid
-from app.db.dynamodb import db_client
+from cachetools import LRUCache
+from app.db.dynamodb import db_client, iso_now
+from app.db.cache import cache_client
+
+# Sort keys never change once a scan is written, so entries never go stale;
+# the bound only keeps a long-running worker's memory flat
+_scan_sort_keys = LRUCache(maxsize=4096)
+
+def _reverse_timestamp() -> str:
+    """Millisecond timestamp that sorts newest-first lexicographically"""
+    return f"{10**13 - int(time.time() * 1000):013d}"
+
+# Legacy scans kept results inline; list views never need them
+_RESULT_FIELDS = ('results', 'ai_recommendations')
+
+def _scans_cache_key(user_id: str) -> str:
+    return f"scans:{user_id}"
 
 class ScanRepository:
     @staticmethod
-    def create_scan(user_id: str, credential_id: str, scan_name: str) -> Dict:
-        scan_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
+    def _build_scan_item(user_id: str, credential_id: str, scan_name: str) -> Dict:
+        scan_id = uuid.uuid4().hex
+        timestamp = iso_now()
         
-        scan_item = {
+        return {
             'PK': f'USER#{user_id}',
-            'SK': f'SCAN#{scan_id}',
+            'SK': f'SCAN#{_reverse_timestamp()}#{scan_id}',
             'GSI1PK': f'SCAN#{scan_id}',
             'GSI1SK': f'TIMESTAMP#{timestamp}',
             'scan_id': scan_id,
@@ -27,24 +43,65 @@ class ScanRepository:
             'created_at': timestamp,
             'updated_at': timestamp,
         }
-        
+    
+    @staticmethod
+    def create_scan(user_id: str, credential_id: str, scan_name: str) -> Dict:
+        scan_item = ScanRepository._build_scan_item(user_id, credential_id, scan_name)
         db_client.put_item(scan_item)
+        _scan_sort_keys[scan_item['scan_id']] = scan_item['SK']
+        cache_client.delete(_scans_cache_key(user_id))
         return scan_item
     
+    @staticmethod
+    def bulk_create_scans(scans: List[Dict]) -> List[Dict]:
+        """Create many scans in batched writes; each dict holds create_scan's arguments"""
+        scan_items = [ScanRepository._build_scan_item(**scan) for scan in scans]
+        db_client.batch_put_items(scan_items)
+        for scan_item in scan_items:
+            _scan_sort_keys[scan_item['scan_id']] = scan_item['SK']
+        cache_client.delete(*{_scans_cache_key(item['user_id']) for item in scan_items})
+        return scan_items
+    
+    @staticmethod
+    def _get_sort_key(scan_id: str) -> str:
+        scan_sk = _scan_sort_keys.get(scan_id)
+        if scan_sk is None:
+            scan = ScanRepository.get_scan_by_id(scan_id)
+            # Fall back to the legacy layout for scans written before time-ordered keys
+            scan_sk = scan['SK'] if scan else f'SCAN#{scan_id}'
+            _scan_sort_keys[scan_id] = scan_sk
+        return scan_sk
+    
     @staticmethod
     def get_scan_by_id(scan_id: str) -> Optional[Dict]:
-        items = db_client.query_gsi('GSI1', f'SCAN#{scan_id}')
+        items = db_client.query_gsi('GSI1', f'SCAN#{scan_id}', limit=1)
         return items[0] if items else None
     
     @staticmethod
-    def get_user_scans(user_id: str) -> List[Dict]:
-        return db_client.query_by_pk(f'USER#{user_id}', 'SCAN#')
+    def get_user_scans(user_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Scans for a user, newest first, without inline results"""
+        # Only the full list is cached; limited queries go straight to DynamoDB
+        key = _scans_cache_key(user_id) if limit is None else None
+        scans = cache_client.get_json(key) if key else None
+        if scans is None:
+            scans = [
+                {k: v for k, v in item.items() if k not in _RESULT_FIELDS}
+                for item in db_client.query_by_pk(f'USER#{user_id}', 'SCAN#', limit=limit)
+            ]
+            if key:
+                cache_client.set_json(key, scans)
+        return scans
     
     @staticmethod
     def update_scan(user_id: str, scan_id: str, updates: Dict) -> bool:
-        updates['updated_at'] = datetime.utcnow().isoformat()
-        return db_client.update_item(f'USER#{user_id}', f'SCAN#{scan_id}', updates)
+        updates['updated_at'] = iso_now()
+        updated = db_client.update_item(f'USER#{user_id}', ScanRepository._get_sort_key(scan_id), updates)
+        cache_client.delete(_scans_cache_key(user_id))
+        return updated
     
     @staticmethod
     def delete_scan(user_id: str, scan_id: str) -> bool:
-        return db_client.delete_item(f'USER#{user_id}', f'SCAN#{scan_id}')
+        deleted = db_client.delete_item(f'USER#{user_id}', ScanRepository._get_sort_key(scan_id))
+        _scan_sort_keys.pop(scan_id, None)
+        cache_client.delete(_scans_cache_key(user_id))
+        return deleted
@@ -0,0 +1,144 @@
+from typing import Optional, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+import orjson
+from botocore.exceptions import ClientError
+from app.core.config import settings, boto_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+s3_client = boto3.client('s3', region_name=settings.AWS_REGION, config=boto_config)
+
+class ScanResultsRepository:
+    """Scan results and AI recommendations stored as S3 objects, referenced by key from the scan item"""
+
+    @staticmethod
+    def results_prefix(user_id: str, scan_id: str) -> str:
+        return f'{user_id}/{scan_id}/regions/'
+
+    @staticmethod
+    def ai_recommendations_key(user_id: str, scan_id: str) -> str:
+        return f'{user_id}/{scan_id}/ai_recommendations.txt'
+
+    @staticmethod
+    def ai_recommendations_blocks_key(user_id: str, scan_id: str) -> str:
+        return f'{user_id}/{scan_id}/ai_recommendations_blocks.json'
+
+    @staticmethod
+    def put_region_results(user_id: str, scan_id: str, region: str, results: Dict) -> str:
+        key = f'{ScanResultsRepository.results_prefix(user_id, scan_id)}{region}.json'
+        s3_client.put_object(
+            Bucket=settings.S3_REPORTS_BUCKET,
+            Key=key,
+            Body=orjson.dumps(results),
+            ContentType='application/json'
+        )
+        return key
+
+    @staticmethod
+    def put_ai_recommendations(user_id: str, scan_id: str, ai_recommendations: str) -> str:
+        key = ScanResultsRepository.ai_recommendations_key(user_id, scan_id)
+        s3_client.put_object(
+            Bucket=settings.S3_REPORTS_BUCKET,
+            Key=key,
+            Body=ai_recommendations.encode(),
+            ContentType='text/plain; charset=utf-8'
+        )
+        return key
+
+    @staticmethod
+    def put_ai_recommendations_blocks(user_id: str, scan_id: str, blocks: List[List[str]]) -> str:
+        key = ScanResultsRepository.ai_recommendations_blocks_key(user_id, scan_id)
+        s3_client.put_object(
+            Bucket=settings.S3_REPORTS_BUCKET,
+            Key=key,
+            Body=orjson.dumps(blocks),
+            ContentType='application/json'
+        )
+        return key
+
+    @staticmethod
+    def get_results(scan: Dict) -> Dict:
+        """Per-region results; scans written before S3 storage keep them inline"""
+        prefix = scan.get('results_prefix')
+        if not prefix:
+            return scan.get('results') or {}
+
+        regions = scan.get('regions_scanned', [])
+        if not regions:
+            return {}
+
+        def load(region: str) -> Optional[Dict]:
+            try:
+                response = s3_client.get_object(Bucket=settings.S3_REPORTS_BUCKET, Key=f'{prefix}{region}.json')
+                return orjson.loads(response['Body'].read())
+            except ClientError as e:
+                logger.error(f"Error loading results for {region}: {e}")
+                return None
+
+        # One object per region; fetch them in parallel on the shared (thread-safe) client
+        with ThreadPoolExecutor(max_workers=min(len(regions), 10)) as executor:
+            loaded = executor.map(load, regions)
+        return {region: data for region, data in zip(regions, loaded) if data is not None}
+
+    @staticmethod
+    def get_ai_recommendations(scan: Dict) -> Optional[str]:
+        key = scan.get('ai_recommendations_key')
+        if not key:
+            return scan.get('ai_recommendations')
+
+        try:
+            response = s3_client.get_object(Bucket=settings.S3_REPORTS_BUCKET, Key=key)
+            return response['Body'].read().decode()
+        except ClientError as e:
+            logger.error(f"Error loading AI recommendations: {e}")
+            return None
+
+    @staticmethod
+    def get_ai_recommendations_blocks(scan: Dict) -> Optional[List[List[str]]]:
+        """Pre-split recommendations, or None for scans stored before they were kept"""
+        key = scan.get('ai_recommendations_blocks_key')
+        if not key:
+            return None
+
+        try:
+            response = s3_client.get_object(Bucket=settings.S3_REPORTS_BUCKET, Key=key)
+            return orjson.loads(response['Body'].read())
+        except ClientError as e:
+            logger.error(f"Error loading AI recommendation blocks: {e}")
+            return None
+
+    @staticmethod
+    def hydrate_for_report(scan: Dict) -> Dict:
+        """Like hydrate, but with the pre-split recommendation blocks in place of the text when stored"""
+        blocks = ScanResultsRepository.get_ai_recommendations_blocks(scan)
+        if blocks is None:
+            return ScanResultsRepository.hydrate(scan)
+        return {
+            **scan,
+            'results': ScanResultsRepository.get_results(scan),
+            'ai_recommendations_blocks': blocks,
+        }
+
+    @staticmethod
+    def hydrate(scan: Dict) -> Dict:
+        """Copy of the scan item with results and ai_recommendations loaded from S3"""
+        return {
+            **scan,
+            'results': ScanResultsRepository.get_results(scan),
+            'ai_recommendations': ScanResultsRepository.get_ai_recommendations(scan),
+        }
+
+    @staticmethod
+    def delete_scan_results(user_id: str, scan_id: str) -> bool:
+        try:
+            paginator = s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=settings.S3_REPORTS_BUCKET, Prefix=f'{user_id}/{scan_id}/'):
+                objects: List[Dict] = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+                if objects:
+                    s3_client.delete_objects(Bucket=settings.S3_REPORTS_BUCKET, Delete={'Objects': objects})
+            return True
+        except ClientError as e:
+            logger.error(f"Error deleting scan results: {e}")
+            return False
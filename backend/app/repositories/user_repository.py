@@ -1,19 +1,36 @@
-from typing import Optional, Dict
-from datetime import datetime
+from typing import Callable, Optional, Dict, List, Tuple
 import uuid
-from app.db.dynamodb import db_client
+from cachetools import TTLCache
+from app.db.dynamodb import db_client, iso_now
+
+# The one process-local cache of profile rows, keyed by 'id:<user_id>', 'email:<email>'
+# and 'username:<username>'; update_user drops every key of the row it writes
+_user_cache = TTLCache(maxsize=10000, ttl=60)
+
+def _cache_keys(user: Dict) -> Tuple[str, ...]:
+    return (f"id:{user['user_id']}", f"email:{user['email']}", f"username:{user['username']}")
+
+def _cache_user(user: Dict) -> None:
+    for key in _cache_keys(user):
+        _user_cache[key] = user
+
+def _evict_user(user: Dict) -> None:
+    for key in _cache_keys(user):
+        _user_cache.pop(key, None)
 
 class UserRepository:
     @staticmethod
-    def create_user(email: str, username: str, hashed_password: str, full_name: Optional[str] = None) -> Dict:
-        user_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
+    def _build_user_item(email: str, username: str, hashed_password: str, full_name: Optional[str] = None) -> Dict:
+        user_id = uuid.uuid4().hex
+        timestamp = iso_now()
         
-        user_item = {
+        return {
             'PK': f'USER#{user_id}',
             'SK': 'PROFILE',
             'GSI1PK': f'EMAIL#{email}',
             'GSI1SK': f'USER#{user_id}',
+            'GSI2PK': f'USERNAME#{username}',
+            'GSI2SK': f'USER#{user_id}',
             'user_id': user_id,
             'email': email,
             'username': username,
@@ -23,36 +40,133 @@ class UserRepository:
             'created_at': timestamp,
             'updated_at': timestamp,
         }
-        
+    
+    @staticmethod
+    def create_user(email: str, username: str, hashed_password: str, full_name: Optional[str] = None) -> Dict:
+        user_item = UserRepository._build_user_item(email, username, hashed_password, full_name)
         db_client.put_item(user_item)
         return user_item
     
+    @staticmethod
+    async def acreate_user(email: str, username: str, hashed_password: str, full_name: Optional[str] = None) -> Dict:
+        user_item = UserRepository._build_user_item(email, username, hashed_password, full_name)
+        await db_client.aput_item(user_item)
+        return user_item
+    
+    @staticmethod
+    def bulk_create_users(users: List[Dict]) -> List[Dict]:
+        """Create many users in batched writes; each dict holds create_user's arguments"""
+        user_items = [UserRepository._build_user_item(**user) for user in users]
+        db_client.batch_put_items(user_items)
+        return user_items
+    
     @staticmethod
     def get_user_by_id(user_id: str) -> Optional[Dict]:
-        return db_client.get_item(f'USER#{user_id}', 'PROFILE')
+        user = _user_cache.get(f'id:{user_id}')
+        if user is None:
+            user = db_client.get_item(f'USER#{user_id}', 'PROFILE')
+            if user:
+                _cache_user(user)
+        return user
+    
+    @staticmethod
+    async def aget_user_by_id_uncached(user_id: str) -> Optional[Dict]:
+        """Current profile row straight from DynamoDB, for checks that must not see a stale cache"""
+        return await db_client.aget_item(f'USER#{user_id}', 'PROFILE')
     
     @staticmethod
     def get_user_by_email(email: str) -> Optional[Dict]:
-        items = db_client.query_gsi('GSI1', f'EMAIL#{email}')
-        return items[0] if items else None
+        user = _user_cache.get(f'email:{email}')
+        if user is None:
+            items = db_client.query_gsi('GSI1', f'EMAIL#{email}', limit=1)
+            user = items[0] if items else None
+            if user:
+                _cache_user(user)
+        return user
+    
+    @staticmethod
+    async def aget_user_by_email(email: str) -> Optional[Dict]:
+        user = _user_cache.get(f'email:{email}')
+        if user is None:
+            items = await db_client.aquery_gsi('GSI1', f'EMAIL#{email}', limit=1)
+            user = items[0] if items else None
+            if user:
+                _cache_user(user)
+        return user
     
     @staticmethod
     def get_user_by_username(username: str) -> Optional[Dict]:
-        # Use scan with filter for username lookup
-        # Note: For production, consider adding a GSI on username for better performance
-        try:
-            response = db_client.table.scan(
-                FilterExpression='username = :username',
-                ExpressionAttributeValues={':username': username}
-            )
-            items = response.get('Items', [])
-            return items[0] if items else None
-        except Exception as e:
-            from app.db.dynamodb import logger
-            logger.error(f"Error getting user by username: {e}")
-            return None
+        user = _user_cache.get(f'username:{username}')
+        if user is None:
+            items = db_client.query_gsi('GSI2', f'USERNAME#{username}', limit=1)
+            user = items[0] if items else None
+            if user:
+                _cache_user(user)
+        return user
+    
+    @staticmethod
+    async def aget_user_by_username(username: str) -> Optional[Dict]:
+        user = _user_cache.get(f'username:{username}')
+        if user is None:
+            items = await db_client.aquery_gsi('GSI2', f'USERNAME#{username}', limit=1)
+            user = items[0] if items else None
+            if user:
+                _cache_user(user)
+        return user
+    
+    @staticmethod
+    def backfill_username_index() -> int:
+        """One-off migration: add GSI2 keys to user profiles created before the username index"""
+        updated = 0
+        scan_kwargs = {
+            'FilterExpression': 'SK = :sk AND attribute_not_exists(GSI2PK)',
+            'ExpressionAttributeValues': {':sk': 'PROFILE'},
+        }
+        while True:
+            response = db_client.table.scan(**scan_kwargs)
+            for user in response.get('Items', []):
+                db_client.update_item(user['PK'], 'PROFILE', {
+                    'GSI2PK': f"USERNAME#{user['username']}",
+                    'GSI2SK': f"USER#{user['user_id']}",
+                })
+                updated += 1
+            if 'LastEvaluatedKey' not in response:
+                return updated
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    @staticmethod
+    def _evict_written(user_id: str, cached: Optional[Dict]) -> None:
+        # Callers read the row's current keys before writing and evict only after the
+        # write lands, so a concurrent read can't re-cache the pre-update row
+        _user_cache.pop(f'id:{user_id}', None)
+        if cached:
+            _evict_user(cached)
+    
+    @staticmethod
+    def _write_and_evict(user_id: str, write: Callable[[], bool]) -> bool:
+        cached = _user_cache.get(f'id:{user_id}') or db_client.get_item(f'USER#{user_id}', 'PROFILE')
+        written = write()
+        UserRepository._evict_written(user_id, cached)
+        return written
     
     @staticmethod
     def update_user(user_id: str, updates: Dict) -> bool:
-        updates['updated_at'] = datetime.utcnow().isoformat()
-        return db_client.update_item(f'USER#{user_id}', 'PROFILE', updates)
+        updates['updated_at'] = iso_now()
+        return UserRepository._write_and_evict(
+            user_id, lambda: db_client.update_item(f'USER#{user_id}', 'PROFILE', updates)
+        )
+    
+    @staticmethod
+    async def aupdate_user(user_id: str, updates: Dict) -> bool:
+        updates['updated_at'] = iso_now()
+        cached = _user_cache.get(f'id:{user_id}') or await db_client.aget_item(f'USER#{user_id}', 'PROFILE')
+        updated = await db_client.aupdate_item(f'USER#{user_id}', 'PROFILE', updates)
+        UserRepository._evict_written(user_id, cached)
+        return updated
+    
+    @staticmethod
+    def revoke_tokens(user_id: str) -> bool:
+        """Invalidate every access token issued so far by bumping the revision they carry"""
+        return UserRepository._write_and_evict(
+            user_id, lambda: db_client.increment_item(f'USER#{user_id}', 'PROFILE', 'token_rev', {'updated_at': iso_now()})
+        )
@@ -1,6 +1,5 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import Optional, List
 
 class CredentialCreate(BaseModel):
     credential_name: str
@@ -8,10 +7,12 @@ class CredentialCreate(BaseModel):
     secret_key: str
 
 class CredentialResponse(BaseModel):
-    id: int
+    id: str
     credential_name: str
     is_active: bool
-    created_at: datetime
+    created_at: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Validates and serializes a whole list in one call
+CREDENTIAL_LIST_ADAPTER = TypeAdapter(List[CredentialResponse])
@@ -1,26 +1,27 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from typing import Optional, List, Dict, Any
 
 class ScanCreate(BaseModel):
     scan_name: str
-    credential_id: int
+    credential_id: str
     regions: Optional[List[str]] = None  # If None, scan all regions
 
 class ScanResponse(BaseModel):
-    id: int
+    id: str
     scan_name: str
     status: str
     progress: int
     regions_scanned: List[str]
-    started_at: Optional[datetime]
-    completed_at: Optional[datetime]
-    created_at: datetime
+    started_at: Optional[str]
+    completed_at: Optional[str]
+    created_at: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ScanDetailResponse(ScanResponse):
     results: Optional[Dict[str, Any]]
     ai_recommendations: Optional[str]
     error_message: Optional[str]
+
+# Validates and serializes a whole list in one call
+SCAN_LIST_ADAPTER = TypeAdapter(List[ScanResponse])
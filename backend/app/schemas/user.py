@@ -1,5 +1,4 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional
 
 class UserCreate(BaseModel):
@@ -20,8 +19,7 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
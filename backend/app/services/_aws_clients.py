@@ -0,0 +1,29 @@
+import boto3
+import socket
+from functools import lru_cache
+from app.core.config import settings, boto_config
+
+# Small signed POSTs must not wait on Nagle; idle pooled sockets are kept alive between calls.
+# botocore always sets TCP_NODELAY and boto_config's tcp_keepalive adds SO_KEEPALIVE, so the
+# clients below carry these already; the httpx transport in bedrock_service takes them directly.
+HTTP_SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+# Built on first use, then shared for the life of the process: boto3 low-level
+# clients are thread-safe, so requests reuse pooled connections instead of
+# repeating endpoint resolution and TLS setup on every call. Importing this
+# module creates nothing.
+
+@lru_cache(maxsize=1)
+def get_session() -> boto3.session.Session:
+    return boto3.session.Session(region_name=settings.AWS_REGION)
+
+@lru_cache(maxsize=1)
+def get_bedrock_runtime():
+    return get_session().client('bedrock-runtime', config=boto_config)
+
+@lru_cache(maxsize=1)
+def get_bedrock_agent_runtime():
+    return get_session().client('bedrock-agent-runtime', config=boto_config)
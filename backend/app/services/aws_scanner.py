@@ -1,211 +1,254 @@
-import boto3
-from typing import Dict, List
+import aioboto3
+from aiobotocore.config import AioConfig
+from botocore.exceptions import ClientError
+from cachetools import TTLCache
+from typing import Dict, FrozenSet, List, Optional
 from datetime import datetime
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared by every client a scanner opens; aiohttp keeps pooled connections alive between calls
+CLIENT_CONFIG = AioConfig(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+)
+
+# Concurrent per-bucket S3 probes
+MAX_BUCKET_PROBES = 32
+
+# S3 and IAM are global; they are scanned once and reported under this region
+GLOBAL_SERVICES_REGION = 'us-east-1'
+
+# Regions enabled for the account, keyed by access key
+_enabled_regions_cache = TTLCache(maxsize=1024, ttl=3600)
+
+# Regions usable without an opt-in, plus ones the account has opted into
+REGION_OPT_IN_FILTER = {'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}
+
+# Instances worth reporting; terminated ones linger in describe_instances for about an hour
+INSTANCE_STATE_FILTER = {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}
+
 class AWSScanner:
+    """
+    Async scanner: every service call is awaited on one event loop, so regions
+    and services are fanned out with asyncio.gather instead of threads.
+    Clients are opened with `async with` at each use site and never returned.
+    """
+    
     def __init__(self, access_key: str, secret_key: str):
         self.access_key = access_key
         self.secret_key = secret_key
+        self._session = aioboto3.Session(
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+    
+    def _client(self, service: str, region: str):
+        return self._session.client(service, region_name=region, config=CLIENT_CONFIG)
+    
+    async def _enabled_regions(self) -> Optional[FrozenSet[str]]:
+        """Regions enabled for the account, or None if they could not be listed"""
+        regions = _enabled_regions_cache.get(self.access_key)
+        if regions is None:
+            try:
+                async with self._client('ec2', 'us-east-1') as ec2:
+                    response = await ec2.describe_regions(AllRegions=False, Filters=[REGION_OPT_IN_FILTER])
+                regions = frozenset(region['RegionName'] for region in response['Regions'])
+                _enabled_regions_cache[self.access_key] = regions
+            except Exception as e:
+                logger.error(f"Error getting regions: {e}")
+        return regions
     
-    def get_all_regions(self) -> List[str]:
+    async def get_all_regions(self) -> List[str]:
         """Get all enabled AWS regions"""
-        try:
-            ec2 = boto3.client(
-                'ec2',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name='us-east-1'
-            )
-            regions = ec2.describe_regions()['Regions']
-            return [region['RegionName'] for region in regions]
-        except Exception as e:
-            logger.error(f"Error getting regions: {e}")
+        regions = await self._enabled_regions()
+        if regions is None:
             return ['us-east-1', 'ap-south-1']
+        return sorted(regions)
+    
+    async def resolve_regions(self, requested: Optional[List[str]] = None) -> List[str]:
+        """Requested regions that are enabled for the account, or every enabled region"""
+        if not requested:
+            return await self.get_all_regions()
+        
+        enabled = await self._enabled_regions()
+        if enabled is None:
+            return requested
+        return [region for region in requested if region in enabled]
     
-    def scan_region(self, region: str) -> Dict:
-        """Scan a specific region"""
-        results = {
-            'region': region,
+    async def scan_global(self) -> Dict:
+        """Scan global services (S3, IAM); these only need to run once per scan"""
+        s3, iam = await asyncio.gather(
+            self._scan_s3(GLOBAL_SERVICES_REGION),
+            self._scan_iam(GLOBAL_SERVICES_REGION),
+        )
+        return {'s3': s3, 'iam': iam}
+    
+    async def scan_region(self, region: str) -> Dict:
+        """Scan regional services in a specific region, querying each service concurrently"""
+        tasks = {
             'ec2': self._scan_ec2(region),
-            's3': self._scan_s3(region) if region == 'us-east-1' else {},
             'rds': self._scan_rds(region),
             'lambda': self._scan_lambda(region),
             'vpc': self._scan_vpc(region),
-            'iam': self._scan_iam(region) if region == 'us-east-1' else {},
             'cloudwatch': self._scan_cloudwatch(region),
         }
+        
+        results = {'region': region}
+        results.update(zip(tasks.keys(), await asyncio.gather(*tasks.values())))
         return results
     
-    def _scan_ec2(self, region: str) -> Dict:
+    async def _scan_ec2(self, region: str) -> Dict:
         """Scan EC2 instances"""
         try:
-            ec2 = boto3.client(
-                'ec2',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            instances = ec2.describe_instances()
-            
             instance_data = []
-            for reservation in instances['Reservations']:
-                for instance in reservation['Instances']:
-                    instance_data.append({
-                        'instance_id': instance['InstanceId'],
-                        'instance_type': instance['InstanceType'],
-                        'state': instance['State']['Name'],
-                        'monitoring': instance.get('Monitoring', {}).get('State', 'disabled'),
-                        'public_ip': instance.get('PublicIpAddress'),
-                    })
+            async with self._client('ec2', region) as ec2:
+                paginator = ec2.get_paginator('describe_instances')
+                
+                # Skip terminated/terminating instances at the source
+                async for page in paginator.paginate(Filters=[INSTANCE_STATE_FILTER]):
+                    for reservation in page['Reservations']:
+                        for instance in reservation['Instances']:
+                            instance_data.append({
+                                'instance_id': instance['InstanceId'],
+                                'instance_type': instance['InstanceType'],
+                                'state': instance['State']['Name'],
+                                'monitoring': instance.get('Monitoring', {}).get('State', 'disabled'),
+                                'public_ip': instance.get('PublicIpAddress'),
+                            })
             
             return {'instances': instance_data, 'count': len(instance_data)}
         except Exception as e:
             logger.error(f"Error scanning EC2 in {region}: {e}")
             return {'instances': [], 'count': 0, 'error': str(e)}
     
-    def _scan_s3(self, region: str) -> Dict:
+    async def _scan_s3(self, region: str) -> Dict:
         """Scan S3 buckets"""
         try:
-            s3 = boto3.client(
-                's3',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            buckets = s3.list_buckets()
-            
-            bucket_data = []
-            for bucket in buckets['Buckets']:
-                try:
-                    encryption = s3.get_bucket_encryption(Bucket=bucket['Name'])
-                    encrypted = True
-                except:
-                    encrypted = False
+            async with self._client('s3', region) as s3:
+                buckets = (await s3.list_buckets())['Buckets']
+                semaphore = asyncio.Semaphore(MAX_BUCKET_PROBES)
                 
-                try:
-                    versioning = s3.get_bucket_versioning(Bucket=bucket['Name'])
-                    versioning_enabled = versioning.get('Status') == 'Enabled'
-                except:
-                    versioning_enabled = False
+                async def probe(bucket: Dict) -> Dict:
+                    async with semaphore:
+                        try:
+                            await s3.get_bucket_encryption(Bucket=bucket['Name'])
+                            encrypted = True
+                        except ClientError:
+                            encrypted = False
+                        
+                        try:
+                            versioning = await s3.get_bucket_versioning(Bucket=bucket['Name'])
+                            versioning_enabled = versioning.get('Status') == 'Enabled'
+                        except ClientError:
+                            versioning_enabled = False
+                    
+                    return {
+                        'name': bucket['Name'],
+                        'encrypted': encrypted,
+                        'versioning': versioning_enabled,
+                    }
                 
-                bucket_data.append({
-                    'name': bucket['Name'],
-                    'encrypted': encrypted,
-                    'versioning': versioning_enabled,
-                })
+                # Per-bucket probes are independent round trips; fan them out
+                bucket_data = await asyncio.gather(*[probe(bucket) for bucket in buckets])
             
-            return {'buckets': bucket_data, 'count': len(bucket_data)}
+            return {'buckets': list(bucket_data), 'count': len(bucket_data)}
         except Exception as e:
             logger.error(f"Error scanning S3: {e}")
             return {'buckets': [], 'count': 0, 'error': str(e)}
     
-    def _scan_rds(self, region: str) -> Dict:
+    async def _scan_rds(self, region: str) -> Dict:
         """Scan RDS instances"""
         try:
-            rds = boto3.client(
-                'rds',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            instances = rds.describe_db_instances()
-            
             db_data = []
-            for db in instances['DBInstances']:
-                db_data.append({
-                    'identifier': db['DBInstanceIdentifier'],
-                    'engine': db['Engine'],
-                    'instance_class': db['DBInstanceClass'],
-                    'multi_az': db['MultiAZ'],
-                    'encrypted': db.get('StorageEncrypted', False),
-                    'backup_retention': db.get('BackupRetentionPeriod', 0),
-                })
+            async with self._client('rds', region) as rds:
+                paginator = rds.get_paginator('describe_db_instances')
+                async for page in paginator.paginate():
+                    for db in page['DBInstances']:
+                        db_data.append({
+                            'identifier': db['DBInstanceIdentifier'],
+                            'engine': db['Engine'],
+                            'instance_class': db['DBInstanceClass'],
+                            'multi_az': db['MultiAZ'],
+                            'encrypted': db.get('StorageEncrypted', False),
+                            'backup_retention': db.get('BackupRetentionPeriod', 0),
+                        })
             
             return {'databases': db_data, 'count': len(db_data)}
         except Exception as e:
             logger.error(f"Error scanning RDS in {region}: {e}")
             return {'databases': [], 'count': 0, 'error': str(e)}
     
-    def _scan_lambda(self, region: str) -> Dict:
+    async def _scan_lambda(self, region: str) -> Dict:
         """Scan Lambda functions"""
         try:
-            lambda_client = boto3.client(
-                'lambda',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            functions = lambda_client.list_functions()
-            
             func_data = []
-            for func in functions['Functions']:
-                func_data.append({
-                    'name': func['FunctionName'],
-                    'runtime': func['Runtime'],
-                    'memory': func['MemorySize'],
-                    'timeout': func['Timeout'],
-                })
+            async with self._client('lambda', region) as lambda_client:
+                paginator = lambda_client.get_paginator('list_functions')
+                async for page in paginator.paginate():
+                    for func in page['Functions']:
+                        func_data.append({
+                            'name': func['FunctionName'],
+                            'runtime': func['Runtime'],
+                            'memory': func['MemorySize'],
+                            'timeout': func['Timeout'],
+                        })
             
             return {'functions': func_data, 'count': len(func_data)}
         except Exception as e:
             logger.error(f"Error scanning Lambda in {region}: {e}")
             return {'functions': [], 'count': 0, 'error': str(e)}
     
-    def _scan_vpc(self, region: str) -> Dict:
+    async def _scan_vpc(self, region: str) -> Dict:
         """Scan VPC configuration"""
         try:
-            ec2 = boto3.client(
-                'ec2',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            vpcs = ec2.describe_vpcs()
-            security_groups = ec2.describe_security_groups()
+            vpcs = 0
+            security_groups = 0
+            async with self._client('ec2', region) as ec2:
+                async for page in ec2.get_paginator('describe_vpcs').paginate():
+                    vpcs += len(page['Vpcs'])
+                async for page in ec2.get_paginator('describe_security_groups').paginate():
+                    security_groups += len(page['SecurityGroups'])
             
             return {
-                'vpcs': len(vpcs['Vpcs']),
-                'security_groups': len(security_groups['SecurityGroups']),
+                'vpcs': vpcs,
+                'security_groups': security_groups,
             }
         except Exception as e:
             logger.error(f"Error scanning VPC in {region}: {e}")
             return {'vpcs': 0, 'security_groups': 0, 'error': str(e)}
     
-    def _scan_iam(self, region: str) -> Dict:
+    async def _scan_iam(self, region: str) -> Dict:
         """Scan IAM configuration"""
         try:
-            iam = boto3.client(
-                'iam',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            users = iam.list_users()
-            roles = iam.list_roles()
+            users = 0
+            roles = 0
+            async with self._client('iam', region) as iam:
+                async for page in iam.get_paginator('list_users').paginate():
+                    users += len(page['Users'])
+                async for page in iam.get_paginator('list_roles').paginate():
+                    roles += len(page['Roles'])
             
             return {
-                'users': len(users['Users']),
-                'roles': len(roles['Roles']),
+                'users': users,
+                'roles': roles,
             }
         except Exception as e:
             logger.error(f"Error scanning IAM: {e}")
             return {'users': 0, 'roles': 0, 'error': str(e)}
     
-    def _scan_cloudwatch(self, region: str) -> Dict:
+    async def _scan_cloudwatch(self, region: str) -> Dict:
         """Scan CloudWatch alarms"""
         try:
-            cloudwatch = boto3.client(
-                'cloudwatch',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=region
-            )
-            alarms = cloudwatch.describe_alarms()
+            alarms = 0
+            async with self._client('cloudwatch', region) as cloudwatch:
+                paginator = cloudwatch.get_paginator('describe_alarms')
+                async for page in paginator.paginate(AlarmTypes=['MetricAlarm']):
+                    alarms += len(page['MetricAlarms'])
             
-            return {'alarms': len(alarms['MetricAlarms'])}
+            return {'alarms': alarms}
         except Exception as e:
             logger.error(f"Error scanning CloudWatch in {region}: {e}")
             return {'alarms': 0, 'error': str(e)}
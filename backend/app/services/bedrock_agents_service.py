@@ -1,11 +1,100 @@
-import boto3
-import json
-from typing import Dict, List, Optional
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 from app.core.config import settings
+from app.services._aws_clients import get_bedrock_runtime, get_bedrock_agent_runtime
 import logging
 
 logger = logging.getLogger(__name__)
 
+PILLAR_PROMPT_TEMPLATE = """Analyze the following AWS infrastructure for the {pillar} pillar:
+
+Provide:
+1. Current State Assessment (score 1-10)
+2. Key Findings (strengths and weaknesses)
+3. Critical Issues (high priority)
+4. Recommendations (specific, actionable)
+5. Implementation Steps
+6. Expected Impact
+
+Report your assessment with the report_pillar_assessment tool."""
+
+# Tool the pillar agents are forced to call, so their output arrives as JSON rather than prose
+PILLAR_REPORT_TOOL = {
+    "name": "report_pillar_assessment",
+    "description": "Report a Well-Architected pillar assessment",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "score": {"type": "integer", "minimum": 1, "maximum": 10},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "weaknesses": {"type": "array", "items": {"type": "string"}},
+            "critical_issues": {"type": "array", "items": {"type": "string"}},
+            "recommendations": {
+                "type": "array",
+                "description": "Ordered by priority, highest first",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                        "implementation_steps": {"type": "array", "items": {"type": "string"}},
+                        "expected_impact": {"type": "string"},
+                    },
+                    "required": ["title", "priority"],
+                },
+            },
+        },
+        "required": ["score", "critical_issues", "recommendations"],
+    },
+}
+
+# Structured reports are far shorter than free-form analyses
+PILLAR_REPORT_MAX_TOKENS = 1500
+
+def format_pillar_analysis(analysis: Dict) -> str:
+    """Plain-text rendering of a structured pillar report"""
+    lines = [f"Score: {analysis.get('score', 'N/A')}/10"]
+    for heading, key in (('Strengths', 'strengths'), ('Weaknesses', 'weaknesses'), ('Critical Issues', 'critical_issues')):
+        if analysis.get(key):
+            lines.append(f"\n{heading}:")
+            lines.extend(f"- {item}" for item in analysis[key])
+    
+    if analysis.get('recommendations'):
+        lines.append("\nRecommendations:")
+        for idx, rec in enumerate(analysis['recommendations'], 1):
+            lines.append(f"{idx}. [{rec.get('priority', 'medium').upper()}] {rec.get('title', '')}")
+            lines.extend(f"   - {step}" for step in rec.get('implementation_steps', []))
+            if rec.get('expected_impact'):
+                lines.append(f"   Impact: {rec['expected_impact']}")
+    return "\n".join(lines)
+
+def project_scan_results(scan_results: Dict, scan_fields: Dict[str, Optional[Tuple[str, ...]]]) -> Dict:
+    """
+    Slice of the scan an agent needs: only the listed services per region, and
+    for resource lists only the listed fields (None keeps the service whole)
+    """
+    projected = {}
+    for region, region_results in scan_results.items():
+        if not isinstance(region_results, dict):
+            continue
+        
+        region_view = {}
+        for service, fields in scan_fields.items():
+            data = region_results.get(service)
+            if not data:
+                continue
+            if fields is None:
+                region_view[service] = data
+                continue
+            region_view[service] = {
+                key: [{field: item.get(field) for field in fields} for item in value] if isinstance(value, list) else value
+                for key, value in data.items()
+            }
+        projected[region] = region_view
+    return projected
+
 class BedrockAgentsService:
     """
     Multi-Agent Architecture for Well-Architected Framework Assessment
@@ -13,8 +102,8 @@ class BedrockAgentsService:
     """
     
     def __init__(self):
-        self.bedrock_runtime = boto3.client('bedrock-runtime', region_name=settings.AWS_REGION)
-        self.bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name=settings.AWS_REGION)
+        self.bedrock_runtime = get_bedrock_runtime()
+        self.bedrock_agent_runtime = get_bedrock_agent_runtime()
         self.model_id = settings.BEDROCK_MODEL_ID
         
         # Define specialized agents for each pillar
@@ -31,7 +120,8 @@ class BedrockAgentsService:
 - Operational readiness
 
 Analyze AWS resources and provide specific, actionable recommendations for operational excellence.""",
-                'focus_areas': ['automation', 'monitoring', 'cicd', 'incident_management']
+                'focus_areas': ['automation', 'monitoring', 'cicd', 'incident_management'],
+                'scan_fields': {'ec2': ('instance_id', 'state', 'monitoring'), 'lambda': ('name', 'runtime'), 'cloudwatch': None}
             },
             'security': {
                 'name': 'Security Agent',
@@ -45,7 +135,8 @@ Analyze AWS resources and provide specific, actionable recommendations for opera
 - Security best practices
 
 Analyze AWS resources and identify security vulnerabilities with remediation steps.""",
-                'focus_areas': ['iam', 'encryption', 'network_security', 'compliance']
+                'focus_areas': ['iam', 'encryption', 'network_security', 'compliance'],
+                'scan_fields': {'ec2': ('instance_id', 'public_ip'), 's3': ('name', 'encrypted', 'versioning'), 'rds': ('identifier', 'encrypted'), 'vpc': None, 'iam': None}
             },
             'reliability': {
                 'name': 'Reliability Agent',
@@ -59,7 +150,8 @@ Analyze AWS resources and identify security vulnerabilities with remediation ste
 - Resilience testing
 
 Analyze AWS resources and recommend improvements for reliability and availability.""",
-                'focus_areas': ['high_availability', 'disaster_recovery', 'fault_tolerance', 'backup']
+                'focus_areas': ['high_availability', 'disaster_recovery', 'fault_tolerance', 'backup'],
+                'scan_fields': {'ec2': ('instance_id', 'state', 'monitoring'), 's3': ('name', 'versioning'), 'rds': ('identifier', 'engine', 'multi_az', 'backup_retention'), 'vpc': None, 'cloudwatch': None}
             },
             'performance_efficiency': {
                 'name': 'Performance Efficiency Agent',
@@ -73,7 +165,8 @@ Analyze AWS resources and recommend improvements for reliability and availabilit
 - Performance monitoring
 
 Analyze AWS resources and identify performance optimization opportunities.""",
-                'focus_areas': ['compute', 'storage', 'database', 'network', 'caching']
+                'focus_areas': ['compute', 'storage', 'database', 'network', 'caching'],
+                'scan_fields': {'ec2': ('instance_id', 'instance_type', 'state'), 'rds': ('identifier', 'engine', 'instance_class'), 'lambda': ('name', 'runtime', 'memory', 'timeout')}
             },
             'cost_optimization': {
                 'name': 'Cost Optimization Agent',
@@ -87,7 +180,8 @@ Analyze AWS resources and identify performance optimization opportunities.""",
 - Cost monitoring and budgets
 
 Analyze AWS resources and identify cost-saving opportunities with ROI calculations.""",
-                'focus_areas': ['rightsizing', 'pricing_models', 'unused_resources', 'storage_optimization']
+                'focus_areas': ['rightsizing', 'pricing_models', 'unused_resources', 'storage_optimization'],
+                'scan_fields': {'ec2': ('instance_id', 'instance_type', 'state'), 'rds': ('identifier', 'instance_class', 'multi_az'), 'lambda': ('name', 'memory', 'timeout'), 's3': ('name', 'versioning')}
             },
             'sustainability': {
                 'name': 'Sustainability Agent',
@@ -101,11 +195,29 @@ Analyze AWS resources and identify cost-saving opportunities with ROI calculatio
 - Sustainable practices
 
 Analyze AWS resources and recommend improvements for environmental sustainability.""",
-                'focus_areas': ['carbon_footprint', 'energy_efficiency', 'resource_utilization', 'serverless']
+                'focus_areas': ['carbon_footprint', 'energy_efficiency', 'resource_utilization', 'serverless'],
+                'scan_fields': {'ec2': ('instance_type', 'state'), 'rds': ('identifier', 'instance_class'), 'lambda': ('name', 'runtime', 'memory')}
             }
         }
+        
+        # Pillar prompts are fixed per agent
+        self._pillar_prompts = {
+            agent_type: PILLAR_PROMPT_TEMPLATE.format(pillar=agent_type)
+            for agent_type in self.agents
+        }
+        
+        # Request fields that only vary by agent; invoke_agent_stream adds the messages
+        self._base_bodies = {
+            agent_type: {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 4096,
+                "system": agent['system_prompt'],
+                "temperature": 0.7,
+            }
+            for agent_type, agent in self.agents.items()
+        }
     
-    def invoke_agent(self, agent_type: str, prompt: str, context: Optional[Dict] = None) -> str:
+    def invoke_agent(self, agent_type: str, prompt: str, context: Optional[Dict] = None, context_json: Optional[str] = None) -> str:
         """
         Invoke a specialized agent for a specific pillar
         
@@ -113,80 +225,114 @@ Analyze AWS resources and recommend improvements for environmental sustainabilit
             agent_type: Type of agent (operational_excellence, security, etc.)
             prompt: User prompt/question
             context: Additional context (scan results, resources, etc.)
+            context_json: Context already serialized by the caller; takes precedence over context
         
         Returns:
             Agent response
         """
+        return ''.join(self.invoke_agent_stream(agent_type, prompt, context, context_json))
+    
+    def invoke_agent_structured(self, agent_type: str, prompt: str, context: Optional[Dict] = None, context_json: Optional[str] = None) -> Dict:
+        """
+        Invoke a specialized agent, forcing it to answer through PILLAR_REPORT_TOOL
+        
+        Takes the same arguments as invoke_agent; returns the tool input as a dict.
+        """
         try:
             if agent_type not in self.agents:
                 raise ValueError(f"Unknown agent type: {agent_type}")
             
-            agent = self.agents[agent_type]
-            system_prompt = agent['system_prompt']
+            body = {
+                **self._base_bodies[agent_type],
+                "max_tokens": PILLAR_REPORT_MAX_TOKENS,
+                "messages": self._build_messages(prompt, context, context_json),
+                "tools": [PILLAR_REPORT_TOOL],
+                "tool_choice": {"type": "tool", "name": PILLAR_REPORT_TOOL["name"]},
+            }
             
-            # Add context to prompt if provided
-            if context:
-                prompt = f"""Context:
-{json.dumps(context, indent=2)}
+            response = self.bedrock_runtime.invoke_model(
+                modelId=self.model_id,
+                body=orjson.dumps(body)
+            )
+            
+            response_body = orjson.loads(response['body'].read())
+            for block in response_body['content']:
+                if block['type'] == 'tool_use':
+                    return block['input']
+            raise ValueError("Agent response did not include a report")
+        
+        except Exception as e:
+            logger.error(f"Error invoking {agent_type} agent: {e}")
+            raise
+    
+    @staticmethod
+    def _build_messages(prompt: str, context: Optional[Dict] = None, context_json: Optional[str] = None) -> List[Dict]:
+        """Single user message, prefixed with the context when one is given"""
+        if context_json is None and context:
+            context_json = orjson.dumps(context).decode()
+        
+        if context_json:
+            prompt = f"""Context:
+{context_json}
 
 Question/Task:
 {prompt}"""
+        
+        return [{"role": "user", "content": prompt}]
+    
+    def invoke_agent_stream(self, agent_type: str, prompt: str, context: Optional[Dict] = None, context_json: Optional[str] = None) -> Iterator[str]:
+        """
+        Invoke a specialized agent, yielding response text as the model generates it
+        
+        Takes the same arguments as invoke_agent.
+        """
+        try:
+            if agent_type not in self.agents:
+                raise ValueError(f"Unknown agent type: {agent_type}")
             
             # Invoke Claude with agent-specific system prompt
-            messages = [{"role": "user", "content": prompt}]
+            body = {**self._base_bodies[agent_type], "messages": self._build_messages(prompt, context, context_json)}
             
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4096,
-                "messages": messages,
-                "system": system_prompt,
-                "temperature": 0.7,
-            }
-            
-            response = self.bedrock_runtime.invoke_model(
+            response = self.bedrock_runtime.invoke_model_with_response_stream(
                 modelId=self.model_id,
-                body=json.dumps(body)
+                body=orjson.dumps(body)
             )
             
-            response_body = json.loads(response['body'].read())
-            return response_body['content'][0]['text']
+            for event in response['body']:
+                chunk = orjson.loads(event['chunk']['bytes'])
+                if chunk['type'] == 'content_block_delta':
+                    yield chunk['delta']['text']
         
         except Exception as e:
             logger.error(f"Error invoking {agent_type} agent: {e}")
             raise
     
-    def analyze_pillar(self, pillar: str, scan_results: Dict) -> Dict:
+    def analyze_pillar(self, pillar: str, scan_results: Dict, scan_json: Optional[str] = None, kb_results: Optional[List[Dict]] = None) -> Dict:
         """
         Analyze a specific pillar using its specialized agent
         
         Args:
             pillar: Pillar name (operational_excellence, security, etc.)
             scan_results: AWS scan results
+            scan_json: Serialized context to send instead of scan_results
+            kb_results: Knowledge Base passages to ground the analysis in
         
         Returns:
             Analysis results with recommendations
         """
         try:
             agent_type = pillar.lower().replace(' ', '_').replace('-', '_')
+            prompt = self._pillar_prompts[agent_type]
+            if kb_results:
+                guidance = "\n".join(result.get('content', {}).get('text', '') for result in kb_results)
+                prompt = f"Relevant Well-Architected guidance:\n{guidance}\n\n{prompt}"
             
-            prompt = f"""Analyze the following AWS infrastructure for the {pillar} pillar:
-
-Provide:
-1. Current State Assessment (score 1-10)
-2. Key Findings (strengths and weaknesses)
-3. Critical Issues (high priority)
-4. Recommendations (specific, actionable)
-5. Implementation Steps
-6. Expected Impact
-
-Format your response in a structured manner."""
-            
-            response = self.invoke_agent(agent_type, prompt, scan_results)
+            analysis = self.invoke_agent_structured(agent_type, prompt, scan_results, context_json=scan_json)
             
             return {
                 'pillar': pillar,
                 'agent': self.agents[agent_type]['name'],
-                'analysis': response,
+                'analysis': analysis,
                 'focus_areas': self.agents[agent_type]['focus_areas']
             }
         
@@ -210,15 +356,25 @@ Format your response in a structured manner."""
         try:
             logger.info("Starting comprehensive multi-agent assessment")
             
-            assessments = {}
+            # The pillar agents run in parallel, so an assessment waits about one Claude
+            # call rather than six. perform_scan calls this from its worker thread, so
+            # threads overlap the network-bound calls without needing an event loop
+            # KB guidance for every pillar is fetched in one concurrent round, before any agent runs
+            from app.services.bedrock_service import bedrock_service, KB_QUERY_TEMPLATE
+            queries = {pillar_key: KB_QUERY_TEMPLATE.format(pillar=pillar_key.replace('_', ' ')) for pillar_key in self.agents}
+            kb_results = bedrock_service.query_knowledge_base_many(list(queries.values()))
             
-            # Run each agent in parallel (can be optimized with threading)
-            for pillar_key, agent_info in self.agents.items():
-                pillar_name = pillar_key.replace('_', ' ').title()
-                logger.info(f"Running {agent_info['name']} assessment")
+            with ThreadPoolExecutor(max_workers=len(self.agents)) as executor:
+                futures = {}
+                for pillar_key, agent_info in self.agents.items():
+                    logger.info(f"Running {agent_info['name']} assessment")
+                    # Each agent only sees the services and fields relevant to its pillar
+                    pillar_json = orjson.dumps(project_scan_results(scan_results, agent_info['scan_fields'])).decode()
+                    futures[pillar_key] = executor.submit(
+                        self.analyze_pillar, pillar_key, scan_results, pillar_json, kb_results[queries[pillar_key]]
+                    )
                 
-                assessment = self.analyze_pillar(pillar_key, scan_results)
-                assessments[pillar_key] = assessment
+                assessments = {pillar_key: future.result() for pillar_key, future in futures.items()}
             
             # Generate executive summary using orchestrator
             executive_summary = self._generate_executive_summary(assessments, scan_results)
@@ -239,7 +395,7 @@ Format your response in a structured manner."""
         try:
             summary_prompt = f"""Based on the following pillar assessments, create an executive summary:
 
-{json.dumps(assessments, indent=2)}
+{orjson.dumps(assessments, option=orjson.OPT_INDENT_2).decode()}
 
 Provide:
 1. Overall Infrastructure Health (1-10)
@@ -259,9 +415,9 @@ Keep it concise and executive-friendly."""
             return "Error generating executive summary"
     
     def _calculate_overall_score(self, assessments: Dict) -> float:
-        """Calculate overall Well-Architected score"""
-        # This is a simplified version - can be enhanced with actual scoring logic
-        return 7.5  # Placeholder
+        """Calculate overall Well-Architected score as the mean of the pillar scores"""
+        scores = [assessment['analysis']['score'] for assessment in assessments.values() if 'analysis' in assessment]
+        return round(sum(scores) / len(scores), 1) if scores else 0.0
     
     def _extract_priority_recommendations(self, assessments: Dict) -> List[Dict]:
         """Extract and prioritize recommendations from all agents"""
@@ -272,10 +428,12 @@ Keep it concise and executive-friendly."""
                 recommendations.append({
                     'pillar': pillar,
                     'agent': assessment.get('agent'),
-                    'summary': assessment['analysis'][:200] + '...'  # First 200 chars
+                    'recommendations': assessment['analysis'].get('recommendations', [])[:5]
                 })
         
         return recommendations
 
-# Singleton instance
-bedrock_agents_service = BedrockAgentsService()
+@lru_cache(maxsize=1)
+def get_bedrock_agents_service() -> BedrockAgentsService:
+    """Shared instance, created on first use so importing this module builds no clients"""
+    return BedrockAgentsService()
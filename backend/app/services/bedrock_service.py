@@ -1,61 +1,255 @@
-import boto3
+import base64
+import hashlib
+import httpx
 import json
-from typing import Dict, List, Optional
+import orjson
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.eventstream import EventStreamBuffer
+from cachetools import LRUCache, TTLCache
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
 from app.core.config import settings
+from app.services._aws_clients import HTTP_SOCKET_OPTIONS, get_session, get_bedrock_runtime, get_bedrock_agent_runtime
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCAN_ANALYSIS_SYSTEM_PROMPT = """You are an AWS Well-Architected Framework expert. 
+Analyze the provided AWS account scan results and provide detailed recommendations 
+based on the 6 pillars: Operational Excellence, Security, Reliability, 
+Performance Efficiency, Cost Optimization, and Sustainability."""
+
+SCAN_ANALYSIS_PROMPT_TEMPLATE = """Analyze the following AWS account scan results and provide comprehensive recommendations:
+
+{payload}
+
+Please provide:
+1. Executive Summary
+2. Pillar-wise Analysis (for each of the 6 pillars)
+3. Critical Issues and Risks
+4. Prioritized Recommendations
+5. Best Practices to Implement
+
+Format your response in a structured manner."""
+
+PILLAR_PROMPT_TEMPLATE = """Based on the following Well-Architected Framework documentation:
+
+{context}
+
+Analyze these AWS resources for the {pillar} pillar:
+
+{resources}
+
+Provide specific, actionable recommendations."""
+
+KB_QUERY_TEMPLATE = "AWS Well-Architected {pillar} pillar best practices"
+
+# Per service: resource list key, id field, fields summarized as value counts, and
+# misconfiguration checks. Everything else in the raw scan stays out of the prompt.
+COMPACT_SCAN_SPEC: Dict[str, Tuple[str, str, Tuple[str, ...], Dict[str, Callable[[Dict], bool]]]] = {
+    'ec2': ('instances', 'instance_id', ('instance_type', 'state'), {
+        'public_ip': lambda item: bool(item.get('public_ip')),
+        'monitoring_disabled': lambda item: item.get('monitoring') != 'enabled',
+    }),
+    's3': ('buckets', 'name', (), {
+        'unencrypted': lambda item: not item.get('encrypted'),
+        'versioning_disabled': lambda item: not item.get('versioning'),
+    }),
+    'rds': ('databases', 'identifier', ('engine', 'instance_class'), {
+        'unencrypted': lambda item: not item.get('encrypted'),
+        'single_az': lambda item: not item.get('multi_az'),
+        'no_backups': lambda item: not item.get('backup_retention'),
+    }),
+    'lambda': ('functions', 'name', ('runtime',), {}),
+}
+
+# Affected resources named per misconfiguration; the rest are only counted
+MAX_LISTED_RESOURCES = 20
+
+def _compact_service(service: str, data: Dict) -> Dict:
+    spec = COMPACT_SCAN_SPEC.get(service)
+    if spec is None:
+        # Scalar-only services (vpc, iam, cloudwatch) are already compact
+        return {key: value for key, value in data.items() if not isinstance(value, (list, dict))}
+    
+    list_key, id_field, breakdown_fields, checks = spec
+    items = data.get(list_key) or []
+    compact = {'count': data.get('count', len(items))}
+    if 'error' in data:
+        compact['error'] = data['error']
+    
+    key_findings = {field: dict(Counter(item.get(field) for item in items)) for field in breakdown_fields}
+    if key_findings:
+        compact['key_findings'] = key_findings
+    
+    misconfigurations = {}
+    for name, check in checks.items():
+        affected = [item.get(id_field) for item in items if check(item)]
+        if affected:
+            misconfigurations[name] = {'count': len(affected), 'resources': affected[:MAX_LISTED_RESOURCES]}
+    if misconfigurations:
+        compact['misconfigurations'] = misconfigurations
+    return compact
+
+def _compact_scan(scan_results: Dict) -> Dict:
+    """
+    Prompt-sized view of a scan: per region and service, counts, value breakdowns
+    and misconfigured resources instead of every resource record
+    """
+    compact = {}
+    for region, region_results in scan_results.items():
+        if not isinstance(region_results, dict):
+            continue
+        compact[region] = {
+            service: _compact_service(service, data)
+            for service, data in region_results.items()
+            # Services with nothing found and no error add tokens but no signal
+            if isinstance(data, dict) and (data.get('count', 1) or 'error' in data)
+        }
+    return compact
+
+# Claude responses keyed by a BLAKE2b digest of the full request; identical requests skip Bedrock
+_claude_cache = LRUCache(maxsize=512)
+# KB results keyed by normalized query text; expire so re-ingested documents show up
+_kb_cache = TTLCache(maxsize=256, ttl=3600)
+
 class BedrockService:
+    # Shared async HTTP client for SigV4-signed Bedrock calls, created on first use
+    _http: Optional[httpx.AsyncClient] = None
+    
     def __init__(self):
-        self.bedrock_runtime = boto3.client(
-            'bedrock-runtime',
-            region_name=settings.AWS_REGION
-        )
-        self.bedrock_agent_runtime = boto3.client(
-            'bedrock-agent-runtime',
-            region_name=settings.AWS_REGION
-        )
+        self.bedrock_runtime = get_bedrock_runtime()
+        self.bedrock_agent_runtime = get_bedrock_agent_runtime()
         self.model_id = settings.BEDROCK_MODEL_ID
         self.inference_profile_arn = settings.BEDROCK_INFERENCE_PROFILE_ARN
         self.kb_id = settings.BEDROCK_KNOWLEDGE_BASE_ID
+        self._credentials = get_session().get_credentials()
+    
+    @property
+    def model_identifier(self) -> str:
+        # Use inference profile if available, otherwise use model ID
+        return self.inference_profile_arn if self.inference_profile_arn else self.model_id
     
-    def invoke_claude(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 4096) -> str:
+    @staticmethod
+    def _claude_body(prompt: str, system_prompt: Optional[str], max_tokens: int) -> Dict:
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        
+        if system_prompt:
+            body["system"] = system_prompt
+        return body
+    
+    def _claude_cache_key(self, body: Dict) -> str:
+        return hashlib.blake2b(
+            json.dumps([self.model_identifier, body], sort_keys=True).encode(),
+            digest_size=16
+        ).hexdigest()
+    
+    def _kb_cache_key(self, query: str, max_results: int) -> str:
+        return f"{self.kb_id}:{max_results}:{' '.join(query.lower().split())}"
+    
+    @classmethod
+    def _http_client(cls) -> httpx.AsyncClient:
+        if cls._http is None:
+            cls._http = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+                    http2=True,
+                    socket_options=HTTP_SOCKET_OPTIONS,
+                ),
+                timeout=httpx.Timeout(10.0, read=300.0),
+            )
+        return cls._http
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        if cls._http is not None:
+            await cls._http.aclose()
+            cls._http = None
+    
+    def _signed_request(self, url: str, body: Dict) -> AWSRequest:
+        """POST request for a Bedrock endpoint, signed with SigV4 using the session's current credentials"""
+        request = AWSRequest(
+            method='POST',
+            url=url,
+            data=json.dumps(body),
+            headers={'Content-Type': 'application/json'}
+        )
+        SigV4Auth(self._credentials.get_frozen_credentials(), 'bedrock', settings.AWS_REGION).add_auth(request)
+        return request
+    
+    def invoke_claude(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 4096, force_refresh: bool = False) -> str:
         """Invoke Claude Sonnet 4 model"""
         try:
-            messages = [{"role": "user", "content": prompt}]
-            
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "messages": messages,
-            }
-            
-            if system_prompt:
-                body["system"] = system_prompt
+            body = self._claude_body(prompt, system_prompt, max_tokens)
+            key = self._claude_cache_key(body)
+            if not force_refresh and key in _claude_cache:
+                return _claude_cache[key]
             
-            # Use inference profile if available, otherwise use model ID
-            model_identifier = self.inference_profile_arn if self.inference_profile_arn else self.model_id
-            
-            response = self.bedrock_runtime.invoke_model(
-                modelId=model_identifier,
-                body=json.dumps(body)
-            )
-            
-            response_body = json.loads(response['body'].read())
-            return response_body['content'][0]['text']
+            text = ''.join(self._stream_body(body))
+            _claude_cache[key] = text
+            return text
+        
+        except Exception as e:
+            logger.error(f"Error invoking Bedrock: {e}")
+            raise
+    
+    async def astream_claude(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 4096) -> AsyncIterator[str]:
+        """
+        Invoke Claude, yielding text deltas as they are generated, without blocking the
+        event loop or holding a worker thread for the length of the generation
+        """
+        url = f"https://bedrock-runtime.{settings.AWS_REGION}.amazonaws.com/model/{quote(self.model_identifier, safe='')}/invoke-with-response-stream"
+        request = self._signed_request(url, self._claude_body(prompt, system_prompt, max_tokens))
+        
+        try:
+            async with self._http_client().stream('POST', request.url, content=request.body, headers=dict(request.headers)) as response:
+                response.raise_for_status()
+                events = EventStreamBuffer()
+                async for data in response.aiter_bytes():
+                    events.add_data(data)
+                    for message in events:
+                        headers = message.headers
+                        if headers.get(':message-type') != 'event':
+                            raise RuntimeError(f"{headers.get(':exception-type') or headers.get(':error-code')}: {message.payload.decode()}")
+                        if headers.get(':event-type') != 'chunk':
+                            continue
+                        chunk = json.loads(base64.b64decode(json.loads(message.payload)['bytes']))
+                        if chunk['type'] == 'content_block_delta':
+                            yield chunk['delta']['text']
         
         except Exception as e:
             logger.error(f"Error invoking Bedrock: {e}")
             raise
     
-    def query_knowledge_base(self, query: str, max_results: int = 5) -> List[Dict]:
+    def _stream_body(self, body: Dict) -> Iterator[str]:
+        response = self.bedrock_runtime.invoke_model_with_response_stream(
+            modelId=self.model_identifier,
+            body=json.dumps(body)
+        )
+        
+        for event in response['body']:
+            chunk = json.loads(event['chunk']['bytes'])
+            if chunk['type'] == 'content_block_delta':
+                yield chunk['delta']['text']
+    
+    def query_knowledge_base(self, query: str, max_results: int = 5, force_refresh: bool = False) -> List[Dict]:
         """Query Bedrock Knowledge Base"""
         try:
             if not self.kb_id:
                 logger.warning("Knowledge Base ID not configured")
                 return []
             
+            key = self._kb_cache_key(query, max_results)
+            if not force_refresh and key in _kb_cache:
+                return _kb_cache[key]
+            
             response = self.bedrock_agent_runtime.retrieve(
                 knowledgeBaseId=self.kb_id,
                 retrievalQuery={'text': query},
@@ -66,50 +260,43 @@ class BedrockService:
                 }
             )
             
-            return response.get('retrievalResults', [])
+            results = response.get('retrievalResults', [])
+            _kb_cache[key] = results
+            return results
         
         except Exception as e:
             logger.error(f"Error querying Knowledge Base: {e}")
             return []
     
+    def query_knowledge_base_many(self, queries: List[str], max_results: int = 5) -> Dict[str, List[Dict]]:
+        """Run several KB queries concurrently, in one round trip of wall time; results keyed by query"""
+        if not self.kb_id:
+            logger.warning("Knowledge Base ID not configured")
+            return {query: [] for query in queries}
+        
+        unique = list(dict.fromkeys(queries))
+        with ThreadPoolExecutor(max_workers=len(unique)) as executor:
+            return dict(zip(unique, executor.map(lambda query: self.query_knowledge_base(query, max_results), unique)))
+    
     def analyze_scan_results(self, scan_results: Dict) -> str:
         """Analyze AWS scan results using Claude"""
-        system_prompt = """You are an AWS Well-Architected Framework expert. 
-Analyze the provided AWS account scan results and provide detailed recommendations 
-based on the 6 pillars: Operational Excellence, Security, Reliability, 
-Performance Efficiency, Cost Optimization, and Sustainability."""
-        
-        prompt = f"""Analyze the following AWS account scan results and provide comprehensive recommendations:
-
-{json.dumps(scan_results, indent=2)}
-
-Please provide:
-1. Executive Summary
-2. Pillar-wise Analysis (for each of the 6 pillars)
-3. Critical Issues and Risks
-4. Prioritized Recommendations
-5. Best Practices to Implement
-
-Format your response in a structured manner."""
-        
-        return self.invoke_claude(prompt, system_prompt, max_tokens=8000)
+        prompt = SCAN_ANALYSIS_PROMPT_TEMPLATE.format(payload=orjson.dumps(_compact_scan(scan_results)).decode())
+        return self.invoke_claude(prompt, SCAN_ANALYSIS_SYSTEM_PROMPT, max_tokens=8000)
+    
+    def astream_scan_analysis(self, scan_results: Dict) -> AsyncIterator[str]:
+        """Same analysis as analyze_scan_results, yielded as it is generated"""
+        prompt = SCAN_ANALYSIS_PROMPT_TEMPLATE.format(payload=orjson.dumps(_compact_scan(scan_results)).decode())
+        return self.astream_claude(prompt, SCAN_ANALYSIS_SYSTEM_PROMPT, max_tokens=8000)
+    
+    @staticmethod
+    def _pillar_prompt(pillar: str, kb_results: List[Dict], resources_json: str) -> str:
+        context = "\n".join([result.get('content', {}).get('text', '') for result in kb_results])
+        return PILLAR_PROMPT_TEMPLATE.format(context=context, pillar=pillar, resources=resources_json)
     
     def get_pillar_recommendations(self, pillar: str, resources: Dict) -> str:
         """Get specific pillar recommendations"""
-        kb_results = self.query_knowledge_base(f"AWS Well-Architected {pillar} pillar best practices")
-        
-        context = "\n".join([result.get('content', {}).get('text', '') for result in kb_results])
-        
-        prompt = f"""Based on the following Well-Architected Framework documentation:
-
-{context}
-
-Analyze these AWS resources for the {pillar} pillar:
-
-{json.dumps(resources, indent=2)}
-
-Provide specific, actionable recommendations."""
-        
+        kb_results = self.query_knowledge_base(KB_QUERY_TEMPLATE.format(pillar=pillar))
+        prompt = self._pillar_prompt(pillar, kb_results, orjson.dumps(_compact_scan(resources)).decode())
         return self.invoke_claude(prompt, max_tokens=4096)
-
+    
 bedrock_service = BedrockService()
@@ -4,15 +4,123 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib import colors
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
-from typing import Dict
+from cachetools import TTLCache
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+import asyncio
+import hashlib
 import io
+import multiprocessing
+import queue
+import re
+import orjson
+import tempfile
+from app.core.config import settings
 
-def generate_pdf_report(scan: Dict) -> bytes:
-    """Generate PDF report from scan results"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+# Reports larger than this spill from memory to a temp file while streaming
+SPOOL_MAX_SIZE = 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Default for missing scan sections; shared, never mutated
+_EMPTY: Dict = {}
+
+# PDF per-region table rows: label and RegionRow field
+PDF_RESOURCE_ROWS = (
+    ("EC2 Instances", 'ec2'),
+    ("RDS Databases", 'rds'),
+    ("Lambda Functions", 'lambda_functions'),
+    ("S3 Buckets", 's3'),
+)
+
+# Renderers are CPU-bound and hold the GIL; worker processes let reports render in parallel
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+# Finished reports keyed by renderer and a digest of their view; reports are a pure
+# function of the view, so a re-download skips rendering. Bounded by total bytes.
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_report_cache = TTLCache(maxsize=REPORT_CACHE_MAX_BYTES, ttl=3600, getsizeof=len)
+
+# Spools reused across reports; only ones that stayed in memory are returned to the pool
+_spool_pool: "queue.LifoQueue[tempfile.SpooledTemporaryFile]" = queue.LifoQueue(maxsize=16)
+
+# Shared by every per-region resource table in the PDF
+RESOURCE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+class RegionRow(NamedTuple):
+    region: str
+    ec2: int
+    rds: int
+    lambda_functions: int
+    s3: int
+    vpcs: int
+    security_groups: int
+
+@dataclass(frozen=True)
+class ReportView:
+    """Scan data flattened once and shared by the PDF and Excel renderers"""
+    scan_info: List[Tuple[str, str]]
+    regions_scanned: int
+    regions: List[RegionRow]
+    # Blank-line separated recommendation blocks, each split into its non-empty lines
+    recommendation_blocks: List[List[str]]
+
+def split_recommendation_blocks(recommendations: str) -> List[List[str]]:
+    """Blank-line separated blocks of the recommendations text, each as its non-empty lines"""
+    blocks = [[line for line in block.split('\n') if line.strip()] for block in re.split(r'\n\s*\n', recommendations)]
+    return [lines for lines in blocks if lines]
+
+def prepare_report_view(scan: Dict) -> ReportView:
+    """Walk the scan once and extract everything either report format needs"""
+    regions = []
+    for region, data in (scan.get('results') or {}).items():
+        vpc = data.get('vpc', _EMPTY)
+        regions.append(RegionRow(
+            region,
+            # int(): results stored inline on legacy scan items come back from DynamoDB as Decimal
+            int(data.get('ec2', _EMPTY).get('count', 0)),
+            int(data.get('rds', _EMPTY).get('count', 0)),
+            int(data.get('lambda', _EMPTY).get('count', 0)),
+            int(data.get('s3', _EMPTY).get('count', 0)),
+            int(vpc.get('vpcs', 0)),
+            int(vpc.get('security_groups', 0)),
+        ))
+    
+    # Scans completed since blocks were stored skip the split entirely
+    blocks = scan.get('ai_recommendations_blocks') or split_recommendation_blocks(
+        scan.get('ai_recommendations') or 'No recommendations available'
+    )
+    
+    return ReportView(
+        scan_info=[
+            ("Scan Name:", scan.get('scan_name', 'N/A')),
+            ("Scan ID:", scan.get('scan_id', 'N/A')),
+            ("Status:", scan.get('status', 'N/A')),
+            ("Created:", scan.get('created_at', 'N/A')),
+            ("Completed:", scan.get('completed_at', 'N/A')),
+        ],
+        regions_scanned=len(scan.get('regions_scanned', [])),
+        regions=regions,
+        recommendation_blocks=blocks,
+    )
+
+def generate_pdf_report(view: ReportView, sink: BinaryIO) -> None:
+    """Write a PDF report from a prepared report view into sink"""
+    # Compressed page streams keep the spooled output, and the bytes streamed to the client, small
+    doc = SimpleDocTemplate(sink, pagesize=letter, pageCompression=1)
     story = []
     styles = getSampleStyleSheet()
     
@@ -28,15 +136,7 @@ def generate_pdf_report(scan: Dict) -> bytes:
     story.append(Spacer(1, 0.2*inch))
     
     # Scan Info
-    info_data = [
-        ["Scan Name:", scan.get('scan_name', 'N/A')],
-        ["Scan ID:", scan.get('scan_id', 'N/A')],
-        ["Status:", scan.get('status', 'N/A')],
-        ["Created:", scan.get('created_at', 'N/A')],
-        ["Completed:", scan.get('completed_at', 'N/A')],
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table = Table(view.scan_info, colWidths=[2*inch, 4*inch])
     info_table.setStyle(TableStyle([
         ('BACKGROUND', (0, 0), (0, -1), colors.grey),
         ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
@@ -53,8 +153,7 @@ def generate_pdf_report(scan: Dict) -> bytes:
     story.append(Paragraph("Executive Summary", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
-    regions = scan.get('regions_scanned', [])
-    story.append(Paragraph(f"Scanned {len(regions)} AWS regions", styles['Normal']))
+    story.append(Paragraph(f"Scanned {view.regions_scanned} AWS regions", styles['Normal']))
     story.append(Spacer(1, 0.2*inch))
     
     # AI Recommendations
@@ -62,104 +161,172 @@ def generate_pdf_report(scan: Dict) -> bytes:
     story.append(Paragraph("AI-Powered Recommendations", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
-    recommendations = scan.get('ai_recommendations', 'No recommendations available')
-    for line in recommendations.split('\n'):
-        if line.strip():
-            story.append(Paragraph(line, styles['Normal']))
-            story.append(Spacer(1, 0.05*inch))
+    # One Paragraph per blank-line separated block rather than per line
+    recommendation_style = ParagraphStyle('Recommendation', parent=styles['Normal'], spaceAfter=0.05*inch)
+    for lines in view.recommendation_blocks:
+        story.append(Paragraph('<br/>'.join(escape(line) for line in lines), recommendation_style))
     
     # Resource Summary
     story.append(PageBreak())
     story.append(Paragraph("Resource Summary by Region", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
-    results = scan.get('results', {})
-    for region, data in results.items():
-        story.append(Paragraph(f"<b>Region: {region}</b>", styles['Heading3']))
+    for row in view.regions:
+        story.append(Paragraph(f"<b>Region: {row.region}</b>", styles['Heading3']))
         
-        resource_data = [
-            ["Resource Type", "Count"],
-            ["EC2 Instances", str(data.get('ec2', {}).get('count', 0))],
-            ["RDS Databases", str(data.get('rds', {}).get('count', 0))],
-            ["Lambda Functions", str(data.get('lambda', {}).get('count', 0))],
-            ["S3 Buckets", str(data.get('s3', {}).get('count', 0))],
-        ]
+        resource_data = [["Resource Type", "Count"]]
+        resource_data += [[label, str(getattr(row, field))] for label, field in PDF_RESOURCE_ROWS]
         
         resource_table = Table(resource_data, colWidths=[3*inch, 2*inch])
-        resource_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        resource_table.setStyle(RESOURCE_TABLE_STYLE)
         story.append(resource_table)
         story.append(Spacer(1, 0.2*inch))
     
     doc.build(story)
-    return buffer.getvalue()
 
-def generate_excel_report(scan: Dict) -> bytes:
-    """Generate Excel report from scan results"""
-    wb = Workbook()
+def generate_excel_report(view: ReportView, sink: BinaryIO) -> None:
+    """Write an Excel report from a prepared report view into sink"""
+    # Write-only mode streams rows out as they are appended instead of holding every cell
+    wb = Workbook(write_only=True)
     
-    # Summary Sheet
-    ws_summary = wb.active
-    ws_summary.title = "Summary"
+    def styled(ws, value, **style) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value=value)
+        for attr, val in style.items():
+            setattr(cell, attr, val)
+        return cell
     
     # Header styling
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(color="FFFFFF", bold=True)
+    header_alignment = Alignment(horizontal="center")
     
-    # Scan Info
-    ws_summary['A1'] = "AWS Well-Architected Assessment Report"
-    ws_summary['A1'].font = Font(size=16, bold=True)
-    
-    ws_summary['A3'] = "Scan Name:"
-    ws_summary['B3'] = scan.get('scan_name', 'N/A')
-    ws_summary['A4'] = "Scan ID:"
-    ws_summary['B4'] = scan.get('scan_id', 'N/A')
-    ws_summary['A5'] = "Status:"
-    ws_summary['B5'] = scan.get('status', 'N/A')
-    ws_summary['A6'] = "Created:"
-    ws_summary['B6'] = scan.get('created_at', 'N/A')
-    ws_summary['A7'] = "Completed:"
-    ws_summary['B7'] = scan.get('completed_at', 'N/A')
+    # Summary Sheet
+    ws_summary = wb.create_sheet("Summary")
+    ws_summary.append([styled(ws_summary, "AWS Well-Architected Assessment Report", font=Font(size=16, bold=True))])
+    ws_summary.append([])
+    for label, value in view.scan_info:
+        ws_summary.append([label, value])
     
     # Resources Sheet
     ws_resources = wb.create_sheet("Resources")
     headers = ["Region", "EC2 Instances", "RDS Databases", "Lambda Functions", "S3 Buckets", "VPCs", "Security Groups"]
+    ws_resources.append([
+        styled(ws_resources, header, fill=header_fill, font=header_font, alignment=header_alignment)
+        for header in headers
+    ])
     
-    for col, header in enumerate(headers, 1):
-        cell = ws_resources.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    results = scan.get('results', {})
-    row = 2
-    for region, data in results.items():
-        ws_resources.cell(row=row, column=1, value=region)
-        ws_resources.cell(row=row, column=2, value=data.get('ec2', {}).get('count', 0))
-        ws_resources.cell(row=row, column=3, value=data.get('rds', {}).get('count', 0))
-        ws_resources.cell(row=row, column=4, value=data.get('lambda', {}).get('count', 0))
-        ws_resources.cell(row=row, column=5, value=data.get('s3', {}).get('count', 0))
-        ws_resources.cell(row=row, column=6, value=data.get('vpc', {}).get('vpcs', 0))
-        ws_resources.cell(row=row, column=7, value=data.get('vpc', {}).get('security_groups', 0))
-        row += 1
+    for row in view.regions:
+        ws_resources.append(row)
     
     # Recommendations Sheet
     ws_recommendations = wb.create_sheet("AI Recommendations")
-    ws_recommendations['A1'] = "AI-Powered Recommendations"
-    ws_recommendations['A1'].font = Font(size=14, bold=True)
+    ws_recommendations.append([styled(ws_recommendations, "AI-Powered Recommendations", font=Font(size=14, bold=True))])
+    ws_recommendations.append([])
     
-    recommendations = scan.get('ai_recommendations', 'No recommendations available')
-    ws_recommendations['A3'] = recommendations
-    ws_recommendations['A3'].alignment = Alignment(wrap_text=True, vertical="top")
+    recommendations = '\n\n'.join('\n'.join(lines) for lines in view.recommendation_blocks)
+    ws_recommendations.append([
+        styled(ws_recommendations, recommendations, alignment=Alignment(wrap_text=True, vertical="top"))
+    ])
     
-    # Save to buffer
+    wb.save(sink)
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        # spawn rather than fork: the API process holds boto3 and event-loop threads
+        _render_pool = ProcessPoolExecutor(
+            max_workers=settings.REPORT_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _render_pool
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(cancel_futures=True)
+        _render_pool = None
+
+def _render_bytes(render: Callable[[ReportView, BinaryIO], None], view: ReportView) -> bytes:
+    """Runs in a worker process; only the view and the finished report cross the process boundary"""
     buffer = io.BytesIO()
-    wb.save(buffer)
+    render(view, buffer)
     return buffer.getvalue()
+
+async def arender_report(render: Callable[[ReportView, BinaryIO], None], view: ReportView) -> bytes:
+    """Render a report in the worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_render_pool(), _render_bytes, render, view)
+
+def _json_default(value):
+    """orjson fallback: RegionRow tuples as plain tuples, DynamoDB numbers as int/float"""
+    if isinstance(value, tuple):
+        return tuple(value)
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError
+
+def _report_cache_key(render: Callable[[ReportView, BinaryIO], None], view: ReportView) -> str:
+    # orjson handles the dataclass natively; everything else goes through _json_default
+    payload = orjson.dumps(view, default=_json_default, option=orjson.OPT_SORT_KEYS)
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return f"{render.__name__}:{digest}"
+
+def _chunks(report: bytes) -> Iterator[bytes]:
+    for offset in range(0, len(report), STREAM_CHUNK_SIZE):
+        yield report[offset:offset + STREAM_CHUNK_SIZE]
+
+def _acquire_spool() -> tempfile.SpooledTemporaryFile:
+    try:
+        return _spool_pool.get_nowait()
+    except queue.Empty:
+        return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+def _release_spool(spool: tempfile.SpooledTemporaryFile, size: int) -> None:
+    # A spool that grew past max_size has rolled over to disk; close it rather than pool a file
+    if size > SPOOL_MAX_SIZE:
+        spool.close()
+        return
+    spool.seek(0)
+    spool.truncate()
+    try:
+        _spool_pool.put_nowait(spool)
+    except queue.Full:
+        spool.close()
+
+def _cache_report(key: str, report: bytes) -> None:
+    # A report larger than the whole cache is served but not kept
+    if len(report) <= REPORT_CACHE_MAX_BYTES:
+        _report_cache[key] = report
+
+async def stream_report(render: Callable[[ReportView, BinaryIO], None], view: ReportView) -> AsyncIterator[bytes]:
+    """Render a report, or reuse an identical cached one, and yield it in chunks"""
+    key = _report_cache_key(render, view)
+    report = _report_cache.get(key)
+    if report is None and settings.REPORT_RENDER_WORKERS > 0:
+        report = await arender_report(render, view)
+        _cache_report(key, report)
+    
+    if report is not None:
+        for chunk in _chunks(report):
+            yield chunk
+        return
+    
+    # In-process fallback: render in a thread into a pooled spool
+    spool = _acquire_spool()
+    size = SPOOL_MAX_SIZE + 1
+    try:
+        await asyncio.to_thread(render, view, spool)
+        size = spool.tell()
+        spool.seek(0)
+        if size <= SPOOL_MAX_SIZE:
+            # Still in memory, so reading it whole costs no disk I/O and lets it be cached
+            report = spool.read()
+            _cache_report(key, report)
+            for chunk in _chunks(report):
+                yield chunk
+        else:
+            while chunk := spool.read(STREAM_CHUNK_SIZE):
+                yield chunk
+    finally:
+        # Runs when streaming finishes or the client disconnects
+        _release_spool(spool, size)
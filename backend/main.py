@@ -1,10 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager, AsyncExitStack
+import aioboto3
 import logging
 
 from app.core.config import settings
 from app.api.routes import auth, credentials, scan, report, s3
+from app.db.dynamodb import db_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,13 +17,29 @@ async def lifespan(app: FastAPI):
     logger.info("Starting AWS Well-Architected GenAI Assessment API...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"AWS Region: {settings.AWS_REGION}")
-    yield
-    logger.info("Shutting down application...")
+    
+    # Async AWS clients shared by request handlers for the lifetime of the app
+    async with AsyncExitStack() as stack:
+        session = aioboto3.Session()
+        app.state.s3 = await stack.enter_async_context(
+            session.client('s3', region_name=settings.AWS_REGION)
+        )
+        await db_client.connect_async(session, stack)
+        yield
+        logger.info("Shutting down application...")
+        db_client.disconnect_async()
+        
+        from app.services.report_service import shutdown_render_pool
+        shutdown_render_pool()
+        
+        from app.services.bedrock_service import BedrockService
+        await BedrockService.aclose()
 
 app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
     description="GenAI-powered AWS Well-Architected Framework Assessment Platform",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
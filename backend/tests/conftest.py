@@ -0,0 +1,8 @@
+import os
+
+from cryptography.fernet import Fernet
+
+# Settings() requires these; tests never touch real secrets. The cipher is built
+# at import, so the encryption key has to be a real Fernet key.
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
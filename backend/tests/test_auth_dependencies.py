@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import auth
+from app.core import security
+from app.core.security import create_access_token
+from app.repositories import user_repository
+from app.repositories.user_repository import UserRepository
+
+USER = {
+    'PK': 'USER#u1', 'SK': 'PROFILE', 'user_id': 'u1', 'username': 'alice', 'email': 'alice@example.com',
+    'is_active': True, 'created_at': 't',
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    """App exposing the auth router plus a route that needs both user dependencies"""
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+    
+    @app.post("/write")
+    async def write(user=Depends(auth.get_current_user), user_id: str = Depends(auth.get_active_user_id)):
+        return {"user_id": user_id}
+    
+    security._token_cache.clear()
+    user_repository._user_cache.clear()
+    return TestClient(app)
+
+@pytest.fixture
+def stored_user(monkeypatch):
+    """Profile row as DynamoDB holds it; lookups return a copy of its current state"""
+    row = dict(USER)
+    
+    async def aquery_gsi(gsi_name, gsi_pk, limit=None):
+        return [dict(row)]
+    
+    async def aget_item(pk, sk):
+        return dict(row)
+    
+    monkeypatch.setattr(user_repository.db_client, 'aquery_gsi', aquery_gsi)
+    monkeypatch.setattr(user_repository.db_client, 'aget_item', aget_item)
+    monkeypatch.setattr(user_repository.db_client, 'get_item', lambda pk, sk: dict(row))
+    return row
+
+def _headers(rev=0):
+    token = create_access_token({'sub': 'alice', 'user_id': 'u1', 'rev': rev}, timedelta(minutes=5))
+    return {'Authorization': f'Bearer {token}'}
+
+def test_token_is_decoded_once_per_request(client, stored_user, monkeypatch):
+    calls = []
+    real = auth.decode_access_token
+    monkeypatch.setattr(auth, 'decode_access_token', lambda token: calls.append(token) or real(token))
+    
+    response = client.post('/write', headers=_headers())
+    
+    assert response.status_code == 200
+    assert response.json() == {'user_id': 'u1'}
+    assert len(calls) == 1
+
+def test_deactivation_applies_to_the_next_write_despite_the_user_cache(client, stored_user):
+    headers = _headers()
+    assert client.post('/write', headers=headers).status_code == 200
+    
+    # Cached lookups would still see the old row; the write check reads past them
+    stored_user['is_active'] = False
+    
+    assert client.post('/write', headers=headers).status_code == 401
+
+def test_revoke_bumps_the_token_revision(client, stored_user, monkeypatch):
+    increments = []
+    
+    def increment_item(pk, sk, attribute, updates=None):
+        increments.append((pk, attribute))
+        stored_user[attribute] = stored_user.get(attribute, 0) + 1
+        return True
+    
+    monkeypatch.setattr(user_repository.db_client, 'increment_item', increment_item)
+    headers = _headers()
+    UserRepository.get_user_by_id('u1')
+    
+    assert client.post('/api/auth/revoke', headers=headers).status_code == 204
+    
+    assert increments == [('USER#u1', 'token_rev')]
+    assert len(user_repository._user_cache) == 0
+    # Tokens carrying the old revision no longer pass; new ones do
+    assert client.post('/write', headers=headers).status_code == 401
+    assert client.post('/write', headers=_headers(rev=1)).status_code == 200
+
+def test_invalid_token_is_rejected(client, stored_user):
+    response = client.post('/write', headers={'Authorization': 'Bearer not-a-token'})
+    
+    assert response.status_code == 401
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.api.routes import auth
+from app.core import security
+from app.core.security import DUMMY_PASSWORD_HASH, get_password_hash
+from app.schemas.user import UserCreate, UserLogin
+
+def _returning(value):
+    async def lookup(*args):
+        return value
+    return staticmethod(lookup)
+
+def _recording(calls):
+    async def update(user_id, fields):
+        calls.append((user_id, fields))
+        return True
+    return staticmethod(update)
+
+def _user(hashed_password):
+    return {
+        'user_id': 'u1',
+        'username': 'alice',
+        'email': 'alice@example.com',
+        'hashed_password': hashed_password,
+        'is_active': True,
+    }
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    """Records every hash login verifies against"""
+    calls = []
+    real = security.verify_and_update_password
+    
+    async def recording(plain_password, hashed_password):
+        calls.append(hashed_password)
+        return real(plain_password, hashed_password)
+    
+    monkeypatch.setattr(auth, 'averify_and_update_password', recording)
+    return calls
+
+def test_login_unknown_user_still_checks_a_hash(monkeypatch, verify_calls):
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_username', _returning(None))
+    
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.login(UserLogin(username='nobody', password='pw')))
+    
+    assert exc.value.status_code == 401
+    assert verify_calls == [DUMMY_PASSWORD_HASH]
+
+def test_login_wrong_password_matches_unknown_user_response(monkeypatch, verify_calls):
+    user = _user(get_password_hash('right'))
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_username', _returning(user))
+    
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.login(UserLogin(username='alice', password='wrong')))
+    
+    assert exc.value.status_code == 401
+    assert exc.value.detail == 'Incorrect username or password'
+    assert verify_calls == [user['hashed_password']]
+
+def test_login_upgrades_bcrypt_hash_to_argon2(monkeypatch, verify_calls):
+    user = _user(CryptContext(schemes=['bcrypt']).hash('pw'))
+    updates = []
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_username', _returning(user))
+    monkeypatch.setattr(auth.UserRepository, 'aupdate_user', _recording(updates))
+    
+    token = asyncio.run(auth.login(UserLogin(username='alice', password='pw')))
+    
+    assert token['token_type'] == 'bearer'
+    assert [user_id for user_id, _ in updates] == ['u1']
+    assert updates[0][1]['hashed_password'].startswith('$argon2id$')
+
+def test_login_keeps_current_argon2_hash(monkeypatch, verify_calls):
+    user = _user(get_password_hash('pw'))
+    updates = []
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_username', _returning(user))
+    monkeypatch.setattr(auth.UserRepository, 'aupdate_user', _recording(updates))
+    
+    asyncio.run(auth.login(UserLogin(username='alice', password='pw')))
+    
+    assert updates == []
+
+def test_signup_goes_through_the_async_repository(monkeypatch):
+    created = []
+    
+    async def acreate_user(**fields):
+        created.append(fields)
+        return {**fields, 'user_id': 'u2', 'is_active': True, 'created_at': 't'}
+    
+    def blocking(*args, **kwargs):
+        raise AssertionError("sync repository call on the event loop")
+    
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_email', _returning(None))
+    monkeypatch.setattr(auth.UserRepository, 'aget_user_by_username', _returning(None))
+    monkeypatch.setattr(auth.UserRepository, 'acreate_user', staticmethod(acreate_user))
+    for name in ('get_user_by_email', 'get_user_by_username', 'create_user', 'update_user'):
+        monkeypatch.setattr(auth.UserRepository, name, staticmethod(blocking))
+    
+    user = asyncio.run(auth.signup(UserCreate(email='bob@example.com', username='bob', password='password123')))
+    
+    assert user['id'] == 'u2'
+    assert created[0]['hashed_password'].startswith('$argon2id$')
@@ -0,0 +1,28 @@
+from app.services import bedrock_service as bedrock_module
+from app.services.bedrock_agents_service import BedrockAgentsService
+
+def test_comprehensive_assessment_grounds_each_pillar_in_one_kb_round(monkeypatch):
+    service = BedrockAgentsService()
+    rounds = []
+    prompts = {}
+    
+    def query_knowledge_base_many(queries, max_results=5):
+        rounds.append(queries)
+        return {query: [{'content': {'text': f'guidance for {query}'}}] for query in queries}
+    
+    def invoke_agent_structured(agent_type, prompt, context=None, context_json=None):
+        prompts[agent_type] = prompt
+        return {'score': 8, 'critical_issues': [], 'recommendations': []}
+    
+    monkeypatch.setattr(bedrock_module.bedrock_service, 'query_knowledge_base_many', query_knowledge_base_many)
+    monkeypatch.setattr(service, 'invoke_agent_structured', invoke_agent_structured)
+    monkeypatch.setattr(service, 'invoke_agent', lambda agent_type, prompt: 'summary')
+    
+    assessment = service.comprehensive_assessment({'us-east-1': {}})
+    
+    assert len(rounds) == 1 and len(rounds[0]) == len(service.agents)
+    assert set(prompts) == set(service.agents)
+    assert prompts['security'].startswith(
+        'Relevant Well-Architected guidance:\nguidance for AWS Well-Architected security pillar best practices\n\n'
+    )
+    assert assessment['overall_score'] == 8.0
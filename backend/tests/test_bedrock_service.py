@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import json
+import threading
+import struct
+import zlib
+
+import httpx
+import pytest
+from botocore.credentials import Credentials
+
+from app.services.bedrock_service import BedrockService
+
+def _event(payload: bytes, **headers: str) -> bytes:
+    """One AWS event-stream message with string headers"""
+    encoded = b''
+    for name, value in headers.items():
+        name = name.replace('_', '-').encode()
+        encoded += bytes([len(name)]) + name + b'\x07' + struct.pack('>H', len(value)) + value.encode()
+    prelude = struct.pack('>II', 16 + len(encoded) + len(payload), len(encoded))
+    message = prelude + struct.pack('>I', zlib.crc32(prelude)) + encoded + payload
+    return message + struct.pack('>I', zlib.crc32(message))
+
+def _chunk(chunk: dict) -> bytes:
+    payload = json.dumps({'bytes': base64.b64encode(json.dumps(chunk).encode()).decode()}).encode()
+    return _event(payload, **{':message-type': 'event', ':event-type': 'chunk'})
+
+def _delta(text: str) -> bytes:
+    return _chunk({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': text}})
+
+@pytest.fixture
+def service(monkeypatch):
+    service = BedrockService()
+    service._credentials = Credentials('AKIDEXAMPLE', 'secret')
+    yield service
+    asyncio.run(BedrockService.aclose())
+
+def _serve(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(BedrockService, '_http', client)
+
+def _collect(stream):
+    async def run():
+        return [text async for text in stream]
+    return asyncio.run(run())
+
+def test_astream_claude_signs_and_decodes_the_event_stream(service, monkeypatch):
+    requests = []
+    stream = _chunk({'type': 'message_start'}) + _delta('Hello') + _delta(', world')
+    
+    async def pieces():
+        # Reads that split messages, so frames are reassembled across them
+        for i in range(0, len(stream), 7):
+            yield stream[i:i + 7]
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=pieces())
+    
+    _serve(monkeypatch, handler)
+    
+    assert _collect(service.astream_claude('Hi', 'system', max_tokens=10)) == ['Hello', ', world']
+    
+    request = requests[0]
+    assert request.url.path.endswith('/invoke-with-response-stream')
+    assert request.headers['Authorization'].startswith('AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/')
+    assert json.loads(request.content)['system'] == 'system'
+
+def test_astream_claude_raises_on_exception_events(service, monkeypatch):
+    error = _event(b'{"message": "slow down"}', **{':message-type': 'exception', ':exception-type': 'throttlingException'})
+    _serve(monkeypatch, lambda request: httpx.Response(200, content=_delta('partial') + error))
+    
+    with pytest.raises(RuntimeError, match='throttlingException'):
+        _collect(service.astream_claude('Hi'))
+
+def test_query_knowledge_base_many_overlaps_retrievals(service, monkeypatch):
+    from app.services import bedrock_service as module
+    module._kb_cache.clear()
+    service.kb_id = 'kb1'
+    queries = [f'query {i}' for i in range(3)]
+    # Each retrieve waits for the others, so this only returns if they run concurrently
+    barrier = threading.Barrier(len(queries), timeout=5)
+    
+    def retrieve(knowledgeBaseId, retrievalQuery, retrievalConfiguration):
+        barrier.wait()
+        return {'retrievalResults': [{'content': {'text': retrievalQuery['text']}}]}
+    
+    monkeypatch.setattr(service.bedrock_agent_runtime, 'retrieve', retrieve)
+    
+    results = service.query_knowledge_base_many(queries + queries[:1])
+    
+    assert results == {query: [{'content': {'text': query}}] for query in queries}
+
+def test_query_knowledge_base_many_without_a_knowledge_base(service):
+    service.kb_id = ''
+    
+    assert service.query_knowledge_base_many(['a', 'b']) == {'a': [], 'b': []}
+
+def test_bedrock_connections_use_nodelay_and_keepalive(service):
+    from app.services._aws_clients import HTTP_SOCKET_OPTIONS
+    
+    for client in (service.bedrock_runtime, service.bedrock_agent_runtime):
+        assert set(HTTP_SOCKET_OPTIONS) <= set(client._endpoint.http_session._socket_options)
+    
+    pool = BedrockService._http_client()._transport._pool
+    assert set(HTTP_SOCKET_OPTIONS) <= set(pool._socket_options)
@@ -0,0 +1,16 @@
+from app.db.dynamodb import _build_update_expression
+
+def test_update_expression_sets_each_attribute_through_placeholders():
+    expression = _build_update_expression({'status': 'completed', 'progress': 100})
+    
+    assert expression == {
+        'UpdateExpression': 'SET #n0 = :v0, #n1 = :v1',
+        'ExpressionAttributeNames': {'#n0': 'status', '#n1': 'progress'},
+        'ExpressionAttributeValues': {':v0': 'completed', ':v1': 100},
+    }
+
+def test_update_expression_keeps_dotted_names_literal():
+    expression = _build_update_expression({'results.us-east-1': {}})
+    
+    assert expression['UpdateExpression'] == 'SET #n0 = :v0'
+    assert expression['ExpressionAttributeNames'] == {'#n0': 'results.us-east-1'}
@@ -0,0 +1,65 @@
+import asyncio
+from decimal import Decimal
+
+from app.core.config import settings
+from app.services import report_service
+from app.services.report_service import (
+    _report_cache_key,
+    generate_excel_report,
+    generate_pdf_report,
+    prepare_report_view,
+    stream_report,
+)
+
+# Results stored inline on the scan item, as read back from DynamoDB
+LEGACY_SCAN = {
+    'scan_id': 'legacy',
+    'scan_name': 'Legacy scan',
+    'status': 'completed',
+    'created_at': '2024-01-01T00:00:00',
+    'completed_at': '2024-01-01T00:05:00',
+    'regions_scanned': ['us-east-1'],
+    'results': {
+        'us-east-1': {
+            'ec2': {'instances': [], 'count': Decimal('3')},
+            'rds': {'databases': [], 'count': Decimal('1')},
+            'lambda': {'functions': [], 'count': Decimal('0')},
+            's3': {'buckets': [], 'count': Decimal('2')},
+            'vpc': {'vpcs': Decimal('1'), 'security_groups': Decimal('4')},
+        },
+    },
+    'ai_recommendations': 'Summary\n\nEnable MFA\nRotate keys',
+}
+
+def _collect(render, view):
+    async def run():
+        return b''.join([chunk async for chunk in stream_report(render, view)])
+    return asyncio.run(run())
+
+def test_prepare_report_view_converts_decimal_counts():
+    view = prepare_report_view(LEGACY_SCAN)
+    
+    row = view.regions[0]
+    assert row == ('us-east-1', 3, 1, 0, 2, 1, 4)
+    assert all(type(value) is int for value in row[1:])
+    assert view.recommendation_blocks == [['Summary'], ['Enable MFA', 'Rotate keys']]
+
+def test_report_cache_key_accepts_decimal_bearing_scan():
+    view = prepare_report_view(LEGACY_SCAN)
+    
+    assert _report_cache_key(generate_pdf_report, view) == _report_cache_key(generate_pdf_report, view)
+    assert _report_cache_key(generate_pdf_report, view) != _report_cache_key(generate_excel_report, view)
+
+def test_stream_report_renders_legacy_scan(monkeypatch):
+    # In-process path; the worker pool is not needed to exercise the cache key
+    monkeypatch.setattr(settings, 'REPORT_RENDER_WORKERS', 0)
+    report_service._report_cache.clear()
+    view = prepare_report_view(LEGACY_SCAN)
+    
+    pdf = _collect(generate_pdf_report, view)
+    xlsx = _collect(generate_excel_report, view)
+    
+    assert pdf.startswith(b'%PDF')
+    assert xlsx.startswith(b'PK')
+    # Second download is served from the content-addressed cache
+    assert _collect(generate_pdf_report, view) == pdf
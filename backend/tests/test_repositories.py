@@ -0,0 +1,151 @@
+import io
+
+from botocore.exceptions import ClientError
+
+from app.repositories import credential_repository, scan_repository, scan_results_repository
+from app.repositories.credential_repository import CredentialRepository
+from app.repositories.scan_repository import ScanRepository
+from app.repositories.scan_results_repository import ScanResultsRepository
+
+class FakeCache:
+    """In-memory stand-in for the Redis list cache"""
+    
+    def __init__(self):
+        self.values = {}
+    
+    def get_json(self, key):
+        return self.values.get(key)
+    
+    def set_json(self, key, value, ttl=None):
+        self.values[key] = value
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.deleted = []
+    
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        return {'Body': io.BytesIO(self.objects[Key])}
+    
+    def get_paginator(self, name):
+        objects = self.objects
+        
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(key for key in objects if key.startswith(Prefix))
+                # Two keys per page so deletes span pages
+                for i in range(0, len(keys), 2):
+                    yield {'Contents': [{'Key': key} for key in keys[i:i + 2]]}
+        return Paginator()
+    
+    def delete_objects(self, Bucket, Delete):
+        self.deleted.append([obj['Key'] for obj in Delete['Objects']])
+
+def test_scan_sort_keys_list_newest_first(monkeypatch):
+    clock = iter([1_700_000_000.0, 1_700_000_001.0])
+    monkeypatch.setattr(scan_repository.time, 'time', lambda: next(clock))
+    
+    older = ScanRepository._build_scan_item('u1', 'c1', 'first')
+    newer = ScanRepository._build_scan_item('u1', 'c1', 'second')
+    
+    assert older['SK'].startswith('SCAN#') and newer['SK'].startswith('SCAN#')
+    # Ascending sort-key order is newest first
+    assert sorted([older['SK'], newer['SK']]) == [newer['SK'], older['SK']]
+
+def test_sort_key_lookup_uses_stored_key_then_legacy_layout(monkeypatch):
+    scan_repository._scan_sort_keys.clear()
+    stored = {'scan_id': 'new', 'SK': 'SCAN#8299999999999#new'}
+    lookups = []
+    
+    def query_gsi(gsi_name, gsi_pk, gsi_sk=None, limit=None):
+        lookups.append(gsi_pk)
+        return [stored] if gsi_pk == 'SCAN#new' else []
+    
+    monkeypatch.setattr(scan_repository.db_client, 'query_gsi', query_gsi)
+    
+    assert ScanRepository._get_sort_key('new') == stored['SK']
+    # Scans written before time-ordered keys used SCAN#<id>
+    assert ScanRepository._get_sort_key('old') == 'SCAN#old'
+    # Both are remembered
+    assert ScanRepository._get_sort_key('new') == stored['SK']
+    assert lookups == ['SCAN#new', 'SCAN#old']
+
+def test_scan_list_cache_omits_inline_results(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(scan_repository, 'cache_client', cache)
+    monkeypatch.setattr(scan_repository.db_client, 'query_by_pk', lambda *args, **kwargs: [
+        {'scan_id': 's1', 'status': 'completed', 'results': {'us-east-1': {}}, 'ai_recommendations': 'text'},
+    ])
+    
+    scans = ScanRepository.get_user_scans('u1')
+    
+    assert scans == [{'scan_id': 's1', 'status': 'completed'}]
+    assert cache.values['scans:u1'] == scans
+
+def test_credential_list_cache_never_holds_secret_fields(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(credential_repository, 'cache_client', cache)
+    monkeypatch.setattr(credential_repository.db_client, 'query_by_pk', lambda *args, **kwargs: [
+        {'credential_id': 'c1', 'credential_name': 'prod', 'is_active': True, 'created_at': 't',
+         'encrypted_access_key': b'a', 'encrypted_secret_key': b's'},
+    ])
+    
+    credentials = CredentialRepository.get_user_credentials('u1')
+    
+    for cached in (credentials, cache.values['creds:u1']):
+        assert cached == [{'credential_id': 'c1', 'credential_name': 'prod', 'is_active': True, 'created_at': 't'}]
+    
+    # Served from the cache on the next read
+    monkeypatch.setattr(credential_repository.db_client, 'query_by_pk', lambda *args, **kwargs: [])
+    assert CredentialRepository.get_user_credentials('u1') == credentials
+
+def test_hydrate_loads_region_objects_and_skips_missing(monkeypatch):
+    prefix = ScanResultsRepository.results_prefix('u1', 's1')
+    s3 = FakeS3({
+        f'{prefix}us-east-1.json': b'{"ec2": {"count": 2}}',
+        f'{prefix}eu-west-1.json': b'{"ec2": {"count": 1}}',
+        ScanResultsRepository.ai_recommendations_key('u1', 's1'): 'Résumé'.encode(),
+    })
+    monkeypatch.setattr(scan_results_repository, 's3_client', s3)
+    scan = {
+        'scan_id': 's1',
+        'results_prefix': prefix,
+        'regions_scanned': ['us-east-1', 'eu-west-1', 'ap-south-1'],
+        'ai_recommendations_key': ScanResultsRepository.ai_recommendations_key('u1', 's1'),
+    }
+    
+    hydrated = ScanResultsRepository.hydrate(scan)
+    
+    assert hydrated['results'] == {'us-east-1': {'ec2': {'count': 2}}, 'eu-west-1': {'ec2': {'count': 1}}}
+    assert hydrated['ai_recommendations'] == 'Résumé'
+    assert 'results' not in scan
+
+def test_hydrate_keeps_legacy_inline_results(monkeypatch):
+    monkeypatch.setattr(scan_results_repository, 's3_client', FakeS3({}))
+    scan = {'scan_id': 's1', 'results': {'us-east-1': {}}, 'ai_recommendations': 'inline'}
+    
+    hydrated = ScanResultsRepository.hydrate(scan)
+    
+    assert hydrated['results'] == {'us-east-1': {}}
+    assert hydrated['ai_recommendations'] == 'inline'
+
+def test_delete_scan_results_removes_every_object_under_the_scan(monkeypatch):
+    s3 = FakeS3({
+        'u1/s1/regions/us-east-1.json': b'{}',
+        'u1/s1/regions/eu-west-1.json': b'{}',
+        'u1/s1/ai_recommendations.txt': b'',
+        'u1/s2/regions/us-east-1.json': b'{}',
+    })
+    monkeypatch.setattr(scan_results_repository, 's3_client', s3)
+    
+    assert ScanResultsRepository.delete_scan_results('u1', 's1') is True
+    
+    deleted = [key for page in s3.deleted for key in page]
+    assert sorted(deleted) == ['u1/s1/ai_recommendations.txt', 'u1/s1/regions/eu-west-1.json', 'u1/s1/regions/us-east-1.json']
+    assert len(s3.deleted) == 2
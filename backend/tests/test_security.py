@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import jwt
+from boto3.dynamodb.types import Binary
+
+from app.core import security
+from app.core.security import (
+    aencrypt_batch,
+    create_access_token,
+    decode_access_token,
+    decrypt_batch,
+    decrypt_credential_cached,
+    encrypt_credential,
+    encrypt_credential_b,
+    invalidate_cached_credential,
+)
+
+def _freeze_after(monkeypatch, timestamp):
+    """Move both the decode cache's clock and PyJWT's expiry check to timestamp"""
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(timestamp, tz)
+    
+    monkeypatch.setattr(security, 'time', SimpleNamespace(time=lambda: timestamp))
+    monkeypatch.setattr(jwt.api_jwt, 'datetime', Later)
+
+def test_decode_access_token_caches_valid_tokens():
+    security._token_cache.clear()
+    token = create_access_token({'sub': 'alice', 'user_id': 'u1'}, timedelta(minutes=5))
+    
+    payload = decode_access_token(token)
+    
+    assert payload['user_id'] == 'u1'
+    assert len(security._token_cache) == 1
+    # Keyed by a digest, never by the raw token
+    assert token not in security._token_cache
+    assert decode_access_token(token) is payload
+
+def test_decode_access_token_does_not_serve_expired_cached_payload(monkeypatch):
+    security._token_cache.clear()
+    token = create_access_token({'sub': 'alice', 'user_id': 'u1'}, timedelta(minutes=5))
+    payload = decode_access_token(token)
+    
+    _freeze_after(monkeypatch, payload['exp'] + 1)
+    
+    assert decode_access_token(token) is None
+    assert len(security._token_cache) == 0
+
+def test_decode_access_token_rejects_bad_signature():
+    security._token_cache.clear()
+    token = jwt.encode({'sub': 'alice', 'exp': datetime.utcnow() + timedelta(minutes=5)}, 'other-key', algorithm='HS256')
+    
+    assert decode_access_token(token) is None
+    assert len(security._token_cache) == 0
+
+def test_binary_credentials_are_raw_fernet_tokens():
+    token = encrypt_credential_b(b'AKIAEXAMPLE')
+    
+    # One base64 layer fewer than the legacy string form
+    assert isinstance(token, bytes)
+    assert len(token) < len(encrypt_credential('AKIAEXAMPLE'))
+    assert decrypt_batch([token]) == ['AKIAEXAMPLE']
+
+def test_decrypt_batch_reads_legacy_strings_and_dynamodb_binary():
+    legacy = encrypt_credential('AKIAEXAMPLE')
+    # boto3 hands Binary attributes back wrapped
+    stored = Binary(encrypt_credential_b(b'wJalrXUtnFEMI'))
+    
+    assert decrypt_batch([legacy, stored]) == ['AKIAEXAMPLE', 'wJalrXUtnFEMI']
+
+def test_decrypt_credential_cached_tracks_version():
+    invalidate_cached_credential('c1')
+    old = [encrypt_credential_b(b'old-access'), encrypt_credential_b(b'old-secret')]
+    new = [encrypt_credential_b(b'new-access'), encrypt_credential_b(b'new-secret')]
+    
+    assert decrypt_credential_cached('c1', 'v1', *old) == ('old-access', 'old-secret')
+    # Same version: served from the cache even if handed other ciphertext
+    assert decrypt_credential_cached('c1', 'v1', *new) == ('old-access', 'old-secret')
+    assert decrypt_credential_cached('c1', 'v2', *new) == ('new-access', 'new-secret')
+    
+    invalidate_cached_credential('c1')
+    assert 'c1' not in security._cred_cache
+
+def test_encrypt_batch_produces_binary_tokens_for_storage():
+    tokens = asyncio.run(aencrypt_batch(['AKIAEXAMPLE', 'wJalrXUtnFEMI']))
+    
+    assert all(isinstance(token, bytes) for token in tokens)
+    assert decrypt_batch(tokens) == ['AKIAEXAMPLE', 'wJalrXUtnFEMI']
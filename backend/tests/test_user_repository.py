@@ -0,0 +1,54 @@
+import asyncio
+
+from app.repositories import user_repository
+from app.repositories.user_repository import UserRepository
+
+USER = {'PK': 'USER#u1', 'SK': 'PROFILE', 'user_id': 'u1', 'email': 'alice@example.com', 'username': 'alice'}
+
+def test_one_lookup_caches_the_row_under_every_key(monkeypatch):
+    user_repository._user_cache.clear()
+    queries = []
+    
+    def query_gsi(gsi_name, gsi_pk, gsi_sk=None, limit=None):
+        queries.append(gsi_pk)
+        return [USER]
+    
+    monkeypatch.setattr(user_repository.db_client, 'query_gsi', query_gsi)
+    monkeypatch.setattr(user_repository.db_client, 'get_item', lambda pk, sk: None)
+    
+    assert UserRepository.get_user_by_username('alice') == USER
+    assert UserRepository.get_user_by_email('alice@example.com') == USER
+    assert UserRepository.get_user_by_id('u1') == USER
+    assert queries == ['USERNAME#alice']
+
+def test_update_user_evicts_every_key_after_the_write(monkeypatch):
+    user_repository._user_cache.clear()
+    monkeypatch.setattr(user_repository.db_client, 'query_gsi', lambda *args, **kwargs: [USER])
+    UserRepository.get_user_by_username('alice')
+    cached_during_write = []
+    
+    def update_item(pk, sk, updates):
+        cached_during_write.append(len(user_repository._user_cache))
+        return True
+    
+    monkeypatch.setattr(user_repository.db_client, 'update_item', update_item)
+    
+    assert UserRepository.update_user('u1', {'is_active': False}) is True
+    assert cached_during_write == [3]
+    assert len(user_repository._user_cache) == 0
+
+def test_aupdate_user_writes_through_the_async_client(monkeypatch):
+    user_repository._user_cache.clear()
+    monkeypatch.setattr(user_repository.db_client, 'query_gsi', lambda *args, **kwargs: [USER])
+    UserRepository.get_user_by_username('alice')
+    writes = []
+    
+    async def aupdate_item(pk, sk, updates):
+        writes.append((pk, sorted(updates)))
+        return True
+    
+    monkeypatch.setattr(user_repository.db_client, 'aupdate_item', aupdate_item)
+    
+    assert asyncio.run(UserRepository.aupdate_user('u1', {'hashed_password': 'h'})) is True
+    assert writes == [('USER#u1', ['hashed_password', 'updated_at'])]
+    assert len(user_repository._user_cache) == 0
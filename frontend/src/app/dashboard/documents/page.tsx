@@ -96,7 +96,7 @@ export default function DocumentsPage() {
                       <h3 className="font-semibold">{doc.file_name}</h3>
                       <p className="text-sm text-gray-600">
                         Size: {(doc.size / 1024).toFixed(2)} KB | Last modified:{' '}
-                        {new Date(doc.last_modified).toLocaleDateString()}
+                        {new Date(doc.last_modified * 1000).toLocaleDateString()}
                       </p>
                     </div>
                     <button
@@ -1,6 +1,19 @@
 import pulumi
 import pulumi_aws as aws
 import json
+import orjson
+import os
+import secrets
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from itertools import islice
+from pathlib import Path
+
+def _dumps(obj):
+    """Compact JSON text for policy and secret documents"""
+    return orjson.dumps(obj).decode()
 
 # Configuration
 config = pulumi.Config()
@@ -12,34 +25,86 @@ us_east_1_provider = aws.Provider("us-east-1-provider", region="us-east-1")
 
 # Use specific VPC
 vpc_id = "vpc-0df24266608a12b69"
-vpc = aws.ec2.get_vpc(id=vpc_id)
 
-# Get all subnets in the VPC
-all_subnets = aws.ec2.get_subnets(filters=[aws.ec2.GetSubnetsFilterArgs(name="vpc-id", values=[vpc_id])])
+def _vpc_subnet_ids(vpc_id, *extra_filters):
+    filters = [aws.ec2.GetSubnetsFilterArgs(name="vpc-id", values=[vpc_id]), *extra_filters]
+    return aws.ec2.get_subnets(filters=filters).ids
+
+# Get all subnets in the VPC; only the ECS services consume these, so the
+# Output form resolves alongside other invokes instead of blocking at import
+all_subnet_ids = aws.ec2.get_subnets_output(
+    filters=[aws.ec2.GetSubnetsFilterArgs(name="vpc-id", values=[vpc_id])]
+).ids
+
+# Subnet-to-AZ layout rarely changes; reuse it for an hour, and during previews
+# reuse any cached layout so only `pulumi up` pays for a refresh.
+# Set PULUMI_REFRESH_SUBNETS=1 to force a fresh lookup.
+SUBNET_CACHE_DIR = Path.home() / ".pulumi-cache"
+SUBNET_CACHE_TTL = 3600
+
+def disk_cached_subnets(lookup):
+    @wraps(lookup)
+    def wrapper(vpc_id):
+        # v2: picks follow describe order again (public subnet preferred), not lowest id
+        cache_path = SUBNET_CACHE_DIR / f"subnets-v2-{vpc_id}.json"
+        fresh = cache_path.exists() and (
+            pulumi.runtime.is_dry_run() or cache_path.stat().st_mtime > time.time() - SUBNET_CACHE_TTL
+        )
+        if fresh and os.environ.get("PULUMI_REFRESH_SUBNETS") != "1":
+            try:
+                return json.loads(cache_path.read_text())
+            except (OSError, ValueError):
+                pass
+        
+        subnet_ids = lookup(vpc_id)
+        try:
+            SUBNET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent run never reads a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=SUBNET_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(subnet_ids, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            pulumi.log.warn(f"Could not cache subnet lookup: {e}")
+        return subnet_ids
+    return wrapper
+
+# describe_subnets takes at most 200 ids per call; chunks are described in parallel
+DESCRIBE_SUBNETS_CHUNK = 200
+DESCRIBE_SUBNETS_WORKERS = 8
 
 # Filter subnets to get only one per AZ (for ALB requirement)
-def get_unique_az_subnets(subnet_ids):
+@lru_cache(maxsize=None)
+@disk_cached_subnets
+def get_unique_az_subnets(vpc_id):
     """Get one subnet per availability zone"""
     import boto3
+    # One client shared by the worker threads (boto3 clients are thread-safe); Pulumi's
+    # synchronous invokes can't be issued from threads, so the describes go through boto3
     ec2 = boto3.client('ec2', region_name=region)
     
-    subnets_response = ec2.describe_subnets(SubnetIds=subnet_ids)
-    az_subnet_map = {}
+    subnet_ids = iter(_vpc_subnet_ids(vpc_id))
+    chunks = list(iter(lambda: list(islice(subnet_ids, DESCRIBE_SUBNETS_CHUNK)), []))
+    with ThreadPoolExecutor(max_workers=DESCRIBE_SUBNETS_WORKERS) as executor:
+        # map keeps chunk order, so subnets come back in the same order as one describe
+        responses = list(executor.map(lambda chunk: ec2.describe_subnets(SubnetIds=chunk), chunks))
     
-    for subnet in subnets_response['Subnets']:
-        az = subnet['AvailabilityZone']
-        subnet_id = subnet['SubnetId']
-        # Prefer public subnets (with MapPublicIpOnLaunch=True)
-        if az not in az_subnet_map or subnet.get('MapPublicIpOnLaunch', False):
-            az_subnet_map[az] = subnet_id
+    az_subnet_map = {}
+    for response in responses:
+        for subnet in response['Subnets']:
+            az = subnet['AvailabilityZone']
+            subnet_id = subnet['SubnetId']
+            # Prefer public subnets (with MapPublicIpOnLaunch=True)
+            if az not in az_subnet_map or subnet.get('MapPublicIpOnLaunch', False):
+                az_subnet_map[az] = subnet_id
     
     return list(az_subnet_map.values())
 
 # Get unique AZ subnets for ALB
-vpc_subnets_for_alb = get_unique_az_subnets(all_subnets.ids)
+vpc_subnets_for_alb = get_unique_az_subnets(vpc_id)
 
 # Use all subnets for ECS tasks
-vpc_subnets = all_subnets
+vpc_subnet_ids = all_subnet_ids
 
 # DynamoDB Table with Point-in-Time Recovery
 dynamodb_table = aws.dynamodb.Table(
@@ -53,6 +118,8 @@ dynamodb_table = aws.dynamodb.Table(
         aws.dynamodb.TableAttributeArgs(name="SK", type="S"),
         aws.dynamodb.TableAttributeArgs(name="GSI1PK", type="S"),
         aws.dynamodb.TableAttributeArgs(name="GSI1SK", type="S"),
+        aws.dynamodb.TableAttributeArgs(name="GSI2PK", type="S"),
+        aws.dynamodb.TableAttributeArgs(name="GSI2SK", type="S"),
     ],
     global_secondary_indexes=[
         aws.dynamodb.TableGlobalSecondaryIndexArgs(
@@ -60,7 +127,14 @@ dynamodb_table = aws.dynamodb.Table(
             hash_key="GSI1PK",
             range_key="GSI1SK",
             projection_type="ALL",
-        )
+        ),
+        # Username lookups for login/authentication
+        aws.dynamodb.TableGlobalSecondaryIndexArgs(
+            name="GSI2",
+            hash_key="GSI2PK",
+            range_key="GSI2SK",
+            projection_type="ALL",
+        ),
     ],
     point_in_time_recovery=aws.dynamodb.TablePointInTimeRecoveryArgs(
         enabled=True,
@@ -68,52 +142,49 @@ dynamodb_table = aws.dynamodb.Table(
     tags={"Environment": "production", "Application": "WellArchitectedGenAI"},
 )
 
-# S3 Bucket for Well-Architected Documents
-import random
-import string
-random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-docs_bucket = aws.s3.BucketV2(
-    "wellarchitected-docs-bucket",
-    bucket=f"wellarchitected-docs-{region}-{random_suffix}",
-    tags={"Environment": "production", "Purpose": "KnowledgeBase"},
-)
+# Bucket name suffix: pinned in stack config so bucket names stay stable across runs
+random_suffix = config.get("bucket_suffix")
+if not random_suffix:
+    random_suffix = secrets.token_hex(4)
+    pulumi.log.info(f"Generated bucket suffix {random_suffix}; persist it with: pulumi config set bucket_suffix {random_suffix}")
 
-docs_bucket_versioning = aws.s3.BucketVersioningV2(
-    "docs-bucket-versioning",
-    bucket=docs_bucket.id,
-    versioning_configuration=aws.s3.BucketVersioningV2VersioningConfigurationArgs(status="Enabled"),
-)
-
-docs_bucket_public_access_block = aws.s3.BucketPublicAccessBlock(
-    "docs-bucket-public-access-block",
-    bucket=docs_bucket.id,
+# Bucket settings shared by every private bucket
+_VERSIONING_ENABLED = aws.s3.BucketVersioningV2VersioningConfigurationArgs(status="Enabled")
+_PUBLIC_ACCESS_BLOCKED = dict(
     block_public_acls=True,
     block_public_policy=True,
     ignore_public_acls=True,
     restrict_public_buckets=True,
 )
 
-# S3 Bucket for Reports
-reports_bucket = aws.s3.BucketV2(
-    "wellarchitected-reports-bucket",
-    bucket=f"wellarchitected-reports-{region}-{random_suffix}",
-    tags={"Environment": "production", "Purpose": "Reports"},
-)
+def private_versioned_bucket(key, purpose):
+    """Versioned bucket with all public access blocked, plus its two companion resources"""
+    # Plain function rather than a ComponentResource: parenting the resources
+    # would change their URNs and make existing stacks replace them
+    bucket = aws.s3.BucketV2(
+        f"wellarchitected-{key}-bucket",
+        bucket=f"wellarchitected-{key}-{region}-{random_suffix}",
+        tags={"Environment": "production", "Purpose": purpose},
+    )
+    
+    aws.s3.BucketVersioningV2(
+        f"{key}-bucket-versioning",
+        bucket=bucket.id,
+        versioning_configuration=_VERSIONING_ENABLED,
+    )
+    
+    aws.s3.BucketPublicAccessBlock(
+        f"{key}-bucket-public-access-block",
+        bucket=bucket.id,
+        **_PUBLIC_ACCESS_BLOCKED,
+    )
+    return bucket
 
-reports_bucket_versioning = aws.s3.BucketVersioningV2(
-    "reports-bucket-versioning",
-    bucket=reports_bucket.id,
-    versioning_configuration=aws.s3.BucketVersioningV2VersioningConfigurationArgs(status="Enabled"),
-)
+# S3 Bucket for Well-Architected Documents
+docs_bucket = private_versioned_bucket("docs", "KnowledgeBase")
 
-reports_bucket_public_access_block = aws.s3.BucketPublicAccessBlock(
-    "reports-bucket-public-access-block",
-    bucket=reports_bucket.id,
-    block_public_acls=True,
-    block_public_policy=True,
-    ignore_public_acls=True,
-    restrict_public_buckets=True,
-)
+# S3 Bucket for Reports
+reports_bucket = private_versioned_bucket("reports", "Reports")
 
 # ECR Repository for Backend
 backend_ecr = aws.ecr.Repository(
@@ -138,31 +209,38 @@ ecs_cluster = aws.ecs.Cluster(
     settings=[aws.ecs.ClusterSettingArgs(name="containerInsights", value="enabled")],
 )
 
-# CloudWatch Log Groups
-backend_log_group = aws.cloudwatch.LogGroup(
-    "backend-logs",
-    name="/ecs/wellarchitected-backend",
-    retention_in_days=7,
-)
+# Per-service settings; log groups, target groups, ECS services and their scaling
+# are declared in loops over this table instead of once per service
+SERVICES = {
+    "backend": {"port": 8000, "health_check_path": "/health"},
+    "frontend": {"port": 3000, "health_check_path": "/"},
+}
 
-frontend_log_group = aws.cloudwatch.LogGroup(
-    "frontend-logs",
-    name="/ecs/wellarchitected-frontend",
-    retention_in_days=7,
-)
+# CloudWatch Log Groups
+log_groups = {
+    name: aws.cloudwatch.LogGroup(
+        f"{name}-logs",
+        name=f"/ecs/wellarchitected-{name}",
+        retention_in_days=7,
+    )
+    for name in SERVICES
+}
+
+# Trust policy shared by both ECS roles, serialized once so the text is byte-identical
+_ECS_ASSUME_ROLE_POLICY = _dumps({
+    "Version": "2012-10-17",
+    "Statement": [{
+        "Effect": "Allow",
+        "Principal": {"Service": "ecs-tasks.amazonaws.com"},
+        "Action": "sts:AssumeRole",
+    }],
+})
 
 # IAM Role for ECS Task Execution
 ecs_task_execution_role = aws.iam.Role(
     "ecs-task-execution-role",
     name="WellArchitectedECSTaskExecutionRole",
-    assume_role_policy=json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [{
-            "Effect": "Allow",
-            "Principal": {"Service": "ecs-tasks.amazonaws.com"},
-            "Action": "sts:AssumeRole",
-        }],
-    }),
+    assume_role_policy=_ECS_ASSUME_ROLE_POLICY,
 )
 
 aws.iam.RolePolicyAttachment(
@@ -175,7 +253,7 @@ aws.iam.RolePolicyAttachment(
 ecs_task_execution_secrets_policy = aws.iam.RolePolicy(
     "ecs-task-execution-secrets-policy",
     role=ecs_task_execution_role.id,
-    policy=json.dumps({
+    policy=_dumps({
         "Version": "2012-10-17",
         "Statement": [{
             "Effect": "Allow",
@@ -189,60 +267,109 @@ ecs_task_execution_secrets_policy = aws.iam.RolePolicy(
 ecs_task_role = aws.iam.Role(
     "ecs-task-role",
     name="WellArchitectedECSTaskRole",
-    assume_role_policy=json.dumps({
+    assume_role_policy=_ECS_ASSUME_ROLE_POLICY,
+)
+
+# Exactly the read calls the account scanner makes (app/services/aws_scanner.py)
+_DESCRIBE_STMT = {
+    "Effect": "Allow",
+    "Action": [
+        "ec2:DescribeRegions",
+        "ec2:DescribeInstances",
+        "ec2:DescribeVpcs",
+        "ec2:DescribeSecurityGroups",
+        "rds:DescribeDBInstances",
+        "lambda:ListFunctions",
+        "iam:ListUsers",
+        "iam:ListRoles",
+        "cloudwatch:DescribeAlarms",
+        "s3:ListAllMyBuckets",
+        "s3:GetEncryptionConfiguration",
+        "s3:GetBucketVersioning",
+    ],
+    "Resource": "*",
+}
+
+# IAM Policy for ECS Task: statements with no resource outputs, built once as a managed policy
+ecs_task_static_policy = aws.iam.Policy(
+    "ecs-task-static-policy",
+    name="WellArchitectedECSTaskStaticPolicy",
+    policy=_dumps({
         "Version": "2012-10-17",
-        "Statement": [{
-            "Effect": "Allow",
-            "Principal": {"Service": "ecs-tasks.amazonaws.com"},
-            "Action": "sts:AssumeRole",
-        }],
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "bedrock:InvokeModel",
+                    "bedrock:InvokeModelWithResponseStream",
+                    "bedrock:Retrieve",
+                    "bedrock:RetrieveAndGenerate",
+                ],
+                "Resource": "*",
+            },
+            _DESCRIBE_STMT,
+        ],
     }),
 )
 
-# IAM Policy for ECS Task
+aws.iam.RolePolicyAttachment(
+    "ecs-task-static-policy-attachment",
+    role=ecs_task_role.name,
+    policy_arn=ecs_task_static_policy.arn,
+)
+
+# Constant action lists for the ARN-scoped statements below
+_DDB_ACTIONS = (
+    "dynamodb:GetItem",
+    "dynamodb:PutItem",
+    "dynamodb:UpdateItem",
+    "dynamodb:DeleteItem",
+    "dynamodb:Query",
+    "dynamodb:Scan",
+    "dynamodb:BatchWriteItem",
+)
+_S3_BUCKET_ACTIONS = ("s3:ListBucket",)
+_S3_OBJECT_ACTIONS = ("s3:GetObject", "s3:PutObject", "s3:DeleteObject", "s3:AbortMultipartUpload")
+
+# IAM Policy for ECS Task: only the statements scoped to this stack's table and buckets
 ecs_task_policy = aws.iam.RolePolicy(
     "ecs-task-policy",
     role=ecs_task_role.id,
-    policy=pulumi.Output.all(dynamodb_table.arn, docs_bucket.arn, reports_bucket.arn).apply(
-        lambda args: json.dumps({
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Action": ["dynamodb:*"],
-                    "Resource": [args[0], f"{args[0]}/index/*"],
-                },
-                {
-                    "Effect": "Allow",
-                    "Action": ["s3:*"],
-                    "Resource": [args[1], f"{args[1]}/*", args[2], f"{args[2]}/*"],
-                },
-                {
-                    "Effect": "Allow",
-                    "Action": ["bedrock:InvokeModel", "bedrock:Retrieve", "bedrock:RetrieveAndGenerate"],
-                    "Resource": "*",
-                },
-                {
-                    "Effect": "Allow",
-                    "Action": ["ec2:Describe*", "rds:Describe*", "lambda:*", "iam:*", "cloudwatch:*", "config:*", "wellarchitected:*"],
-                    "Resource": "*",
-                },
-            ],
-        })
-    ),
+    policy=pulumi.Output.json_dumps({
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": _DDB_ACTIONS,
+                "Resource": [dynamodb_table.arn, pulumi.Output.concat(dynamodb_table.arn, "/index/*")],
+            },
+            {
+                "Effect": "Allow",
+                "Action": _S3_BUCKET_ACTIONS,
+                "Resource": [docs_bucket.arn, reports_bucket.arn],
+            },
+            {
+                "Effect": "Allow",
+                "Action": _S3_OBJECT_ACTIONS,
+                "Resource": [pulumi.Output.concat(docs_bucket.arn, "/*"), pulumi.Output.concat(reports_bucket.arn, "/*")],
+            },
+        ],
+    }),
 )
 
+# Security group rules, built once; the open egress rule is shared by both groups
+_HTTP_INGRESS = aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=80, to_port=80, cidr_blocks=["0.0.0.0/0"])
+_HTTPS_INGRESS = aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=443, to_port=443, cidr_blocks=["0.0.0.0/0"])
+_ALL_EGRESS = aws.ec2.SecurityGroupEgressArgs(protocol="-1", from_port=0, to_port=0, cidr_blocks=["0.0.0.0/0"])
+
 # Security Group for ALB
 alb_security_group = aws.ec2.SecurityGroup(
     "alb-sg",
     name="wellarchitected-alb-sg",
     description="Security group for Application Load Balancer",
     vpc_id=vpc_id,
-    ingress=[
-        aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=80, to_port=80, cidr_blocks=["0.0.0.0/0"]),
-        aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=443, to_port=443, cidr_blocks=["0.0.0.0/0"]),
-    ],
-    egress=[aws.ec2.SecurityGroupEgressArgs(protocol="-1", from_port=0, to_port=0, cidr_blocks=["0.0.0.0/0"])],
+    ingress=[_HTTP_INGRESS, _HTTPS_INGRESS],
+    egress=[_ALL_EGRESS],
 )
 
 # Security Group for ECS Tasks
@@ -252,10 +379,10 @@ ecs_security_group = aws.ec2.SecurityGroup(
     description="Security group for ECS tasks",
     vpc_id=vpc_id,
     ingress=[
-        aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=8000, to_port=8000, security_groups=[alb_security_group.id]),
-        aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=3000, to_port=3000, security_groups=[alb_security_group.id]),
+        aws.ec2.SecurityGroupIngressArgs(protocol="tcp", from_port=cfg["port"], to_port=cfg["port"], security_groups=[alb_security_group.id])
+        for cfg in SERVICES.values()
     ],
-    egress=[aws.ec2.SecurityGroupEgressArgs(protocol="-1", from_port=0, to_port=0, cidr_blocks=["0.0.0.0/0"])],
+    egress=[_ALL_EGRESS],
 )
 
 # Application Load Balancer (use unique AZ subnets)
@@ -268,41 +395,26 @@ alb = aws.lb.LoadBalancer(
     enable_deletion_protection=False,
 )
 
-# Target Group for Backend
-backend_target_group = aws.lb.TargetGroup(
-    "backend-tg",
-    name="wellarchitected-backend-tg",
-    port=8000,
-    protocol="HTTP",
-    vpc_id=vpc_id,
-    target_type="ip",
-    health_check=aws.lb.TargetGroupHealthCheckArgs(
-        enabled=True,
-        path="/health",
-        interval=30,
-        timeout=5,
-        healthy_threshold=2,
-        unhealthy_threshold=3,
-    ),
-)
-
-# Target Group for Frontend
-frontend_target_group = aws.lb.TargetGroup(
-    "frontend-tg",
-    name="wellarchitected-frontend-tg",
-    port=3000,
-    protocol="HTTP",
-    vpc_id=vpc_id,
-    target_type="ip",
-    health_check=aws.lb.TargetGroupHealthCheckArgs(
-        enabled=True,
-        path="/",
-        interval=30,
-        timeout=5,
-        healthy_threshold=2,
-        unhealthy_threshold=3,
-    ),
-)
+# Target Groups
+target_groups = {
+    name: aws.lb.TargetGroup(
+        f"{name}-tg",
+        name=f"wellarchitected-{name}-tg",
+        port=cfg["port"],
+        protocol="HTTP",
+        vpc_id=vpc_id,
+        target_type="ip",
+        health_check=aws.lb.TargetGroupHealthCheckArgs(
+            enabled=True,
+            path=cfg["health_check_path"],
+            interval=30,
+            timeout=5,
+            healthy_threshold=2,
+            unhealthy_threshold=3,
+        ),
+    )
+    for name, cfg in SERVICES.items()
+}
 
 # ALB Listener
 alb_listener = aws.lb.Listener(
@@ -312,7 +424,7 @@ alb_listener = aws.lb.Listener(
     protocol="HTTP",
     default_actions=[aws.lb.ListenerDefaultActionArgs(
         type="forward",
-        target_group_arn=frontend_target_group.arn,
+        target_group_arn=target_groups["frontend"].arn,
     )],
 )
 
@@ -322,7 +434,7 @@ backend_listener_rule = aws.lb.ListenerRule(
     listener_arn=alb_listener.arn,
     priority=100,
     conditions=[aws.lb.ListenerRuleConditionArgs(path_pattern=aws.lb.ListenerRuleConditionPathPatternArgs(values=["/api/*"]))],
-    actions=[aws.lb.ListenerRuleActionArgs(type="forward", target_group_arn=backend_target_group.arn)],
+    actions=[aws.lb.ListenerRuleActionArgs(type="forward", target_group_arn=target_groups["backend"].arn)],
 )
 
 # Secrets Manager for sensitive environment variables (must be defined before task definition)
@@ -335,13 +447,18 @@ backend_secrets = aws.secretsmanager.Secret(
 backend_secret_version = aws.secretsmanager.SecretVersion(
     "backend-secret-version",
     secret_id=backend_secrets.id,
-    secret_string=json.dumps({
+    # Masked in state and CLI output. Output.json_dumps matches json.dumps byte for byte;
+    # any change to this text would publish the placeholder values as a new version
+    secret_string=pulumi.Output.secret(pulumi.Output.json_dumps({
         "SECRET_KEY": "change-this-in-production",
         "ENCRYPTION_KEY": "change-this-in-production",
         "BEDROCK_INFERENCE_PROFILE_ARN": "arn:aws:bedrock:ap-south-1:892345653395:inference-profile/apac.anthropic.claude-sonnet-4-5-20250929-v1:0",
-    }),
+    })),
 )
 
+# Keys of backend_secrets injected into the backend container as environment variables
+BACKEND_SECRET_KEYS = ("SECRET_KEY", "ENCRYPTION_KEY", "BEDROCK_INFERENCE_PROFILE_ARN")
+
 # ECS Task Definition for Backend
 backend_task_definition = aws.ecs.TaskDefinition(
     "backend-task",
@@ -352,100 +469,32 @@ backend_task_definition = aws.ecs.TaskDefinition(
     memory="2048",
     execution_role_arn=ecs_task_execution_role.arn,
     task_role_arn=ecs_task_role.arn,
-    container_definitions=pulumi.Output.all(backend_ecr.repository_url, backend_log_group.name, region, dynamodb_table.name, docs_bucket.bucket, reports_bucket.bucket, backend_secrets.arn).apply(
-        lambda args: json.dumps([{
-            "name": "backend",
-            "image": f"{args[0]}:latest",
-            "essential": True,
-            "portMappings": [{"containerPort": 8000, "protocol": "tcp"}],
-            "environment": [
-                {"name": "AWS_REGION", "value": args[2]},
-                {"name": "DYNAMODB_TABLE_NAME", "value": args[3]},
-                {"name": "S3_DOCS_BUCKET", "value": args[4]},
-                {"name": "S3_REPORTS_BUCKET", "value": args[5]},
-                {"name": "BEDROCK_MODEL_ID", "value": "anthropic.claude-sonnet-4-5-20250929-v1:0"},
-                {"name": "ENVIRONMENT", "value": "production"},
-            ],
-            "secrets": [
-                {"name": "SECRET_KEY", "valueFrom": f"{args[6]}:SECRET_KEY::"},
-                {"name": "ENCRYPTION_KEY", "valueFrom": f"{args[6]}:ENCRYPTION_KEY::"},
-                {"name": "BEDROCK_INFERENCE_PROFILE_ARN", "valueFrom": f"{args[6]}:BEDROCK_INFERENCE_PROFILE_ARN::"},
-            ],
-            "logConfiguration": {
-                "logDriver": "awslogs",
-                "options": {
-                    "awslogs-group": args[1],
-                    "awslogs-region": args[2],
-                    "awslogs-stream-prefix": "backend",
-                },
+    container_definitions=pulumi.Output.json_dumps([{
+        "name": "backend",
+        "image": pulumi.Output.format("{0}:latest", backend_ecr.repository_url),
+        "essential": True,
+        "portMappings": [{"containerPort": 8000, "protocol": "tcp"}],
+        "environment": [
+            {"name": "AWS_REGION", "value": region},
+            {"name": "DYNAMODB_TABLE_NAME", "value": dynamodb_table.name},
+            {"name": "S3_DOCS_BUCKET", "value": docs_bucket.bucket},
+            {"name": "S3_REPORTS_BUCKET", "value": reports_bucket.bucket},
+            {"name": "BEDROCK_MODEL_ID", "value": "anthropic.claude-sonnet-4-5-20250929-v1:0"},
+            {"name": "ENVIRONMENT", "value": "production"},
+        ],
+        "secrets": [
+            {"name": key, "valueFrom": pulumi.Output.format("{0}:{1}::", backend_secrets.arn, key)}
+            for key in BACKEND_SECRET_KEYS
+        ],
+        "logConfiguration": {
+            "logDriver": "awslogs",
+            "options": {
+                "awslogs-group": log_groups["backend"].name,
+                "awslogs-region": region,
+                "awslogs-stream-prefix": "backend",
             },
-        }])
-    ),
-)
-
-# ECS Service for Backend with Auto Scaling
-backend_service = aws.ecs.Service(
-    "backend-service",
-    name="wellarchitected-backend-service",
-    cluster=ecs_cluster.arn,
-    task_definition=backend_task_definition.arn,
-    desired_count=2,
-    launch_type="FARGATE",
-    network_configuration=aws.ecs.ServiceNetworkConfigurationArgs(
-        assign_public_ip=True,
-        subnets=vpc_subnets.ids,
-        security_groups=[ecs_security_group.id],
-    ),
-    load_balancers=[aws.ecs.ServiceLoadBalancerArgs(
-        target_group_arn=backend_target_group.arn,
-        container_name="backend",
-        container_port=8000,
-    )],
-    opts=pulumi.ResourceOptions(depends_on=[alb_listener]),
-)
-
-# Auto Scaling Target for Backend
-backend_scaling_target = aws.appautoscaling.Target(
-    "backend-scaling-target",
-    max_capacity=10,
-    min_capacity=2,
-    resource_id=pulumi.Output.concat("service/", ecs_cluster.name, "/", backend_service.name),
-    scalable_dimension="ecs:service:DesiredCount",
-    service_namespace="ecs",
-)
-
-# Auto Scaling Policy - CPU
-backend_cpu_scaling = aws.appautoscaling.Policy(
-    "backend-cpu-scaling",
-    policy_type="TargetTrackingScaling",
-    resource_id=backend_scaling_target.resource_id,
-    scalable_dimension=backend_scaling_target.scalable_dimension,
-    service_namespace=backend_scaling_target.service_namespace,
-    target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
-        predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
-            predefined_metric_type="ECSServiceAverageCPUUtilization",
-        ),
-        target_value=70.0,
-        scale_in_cooldown=300,
-        scale_out_cooldown=60,
-    ),
-)
-
-# Auto Scaling Policy - Memory
-backend_memory_scaling = aws.appautoscaling.Policy(
-    "backend-memory-scaling",
-    policy_type="TargetTrackingScaling",
-    resource_id=backend_scaling_target.resource_id,
-    scalable_dimension=backend_scaling_target.scalable_dimension,
-    service_namespace=backend_scaling_target.service_namespace,
-    target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
-        predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
-            predefined_metric_type="ECSServiceAverageMemoryUtilization",
-        ),
-        target_value=80.0,
-        scale_in_cooldown=300,
-        scale_out_cooldown=60,
-    ),
+        },
+    }]),
 )
 
 # ECS Task Definition for Frontend
@@ -457,70 +506,90 @@ frontend_task_definition = aws.ecs.TaskDefinition(
     cpu="512",
     memory="1024",
     execution_role_arn=ecs_task_execution_role.arn,
-    container_definitions=pulumi.Output.all(frontend_ecr.repository_url, frontend_log_group.name, region, alb.dns_name).apply(
-        lambda args: json.dumps([{
-            "name": "frontend",
-            "image": f"{args[0]}:latest",
-            "essential": True,
-            "portMappings": [{"containerPort": 3000, "protocol": "tcp"}],
-            "environment": [
-                {"name": "NEXT_PUBLIC_API_URL", "value": f"http://{args[3]}"},
-            ],
-            "logConfiguration": {
-                "logDriver": "awslogs",
-                "options": {
-                    "awslogs-group": args[1],
-                    "awslogs-region": args[2],
-                    "awslogs-stream-prefix": "frontend",
-                },
+    container_definitions=pulumi.Output.json_dumps([{
+        "name": "frontend",
+        "image": pulumi.Output.format("{0}:latest", frontend_ecr.repository_url),
+        "essential": True,
+        "portMappings": [{"containerPort": 3000, "protocol": "tcp"}],
+        "environment": [
+            {"name": "NEXT_PUBLIC_API_URL", "value": pulumi.Output.format("http://{0}", alb.dns_name)},
+        ],
+        "logConfiguration": {
+            "logDriver": "awslogs",
+            "options": {
+                "awslogs-group": log_groups["frontend"].name,
+                "awslogs-region": region,
+                "awslogs-stream-prefix": "frontend",
             },
-        }])
-    ),
-)
-
-# ECS Service for Frontend with Auto Scaling
-frontend_service = aws.ecs.Service(
-    "frontend-service",
-    name="wellarchitected-frontend-service",
-    cluster=ecs_cluster.arn,
-    task_definition=frontend_task_definition.arn,
-    desired_count=2,
-    launch_type="FARGATE",
-    network_configuration=aws.ecs.ServiceNetworkConfigurationArgs(
-        assign_public_ip=True,
-        subnets=vpc_subnets.ids,
-        security_groups=[ecs_security_group.id],
-    ),
-    load_balancers=[aws.ecs.ServiceLoadBalancerArgs(
-        target_group_arn=frontend_target_group.arn,
-        container_name="frontend",
-        container_port=3000,
-    )],
-    opts=pulumi.ResourceOptions(depends_on=[alb_listener]),
-)
-
-# Auto Scaling Target for Frontend
-frontend_scaling_target = aws.appautoscaling.Target(
-    "frontend-scaling-target",
-    max_capacity=10,
-    min_capacity=2,
-    resource_id=pulumi.Output.concat("service/", ecs_cluster.name, "/", frontend_service.name),
-    scalable_dimension="ecs:service:DesiredCount",
-    service_namespace="ecs",
-)
+        },
+    }]),
+)
+
+task_definitions = {"backend": backend_task_definition, "frontend": frontend_task_definition}
+
+# ECS Services with Auto Scaling
+services = {}
+scaling_targets = {}
+for name, cfg in SERVICES.items():
+    services[name] = aws.ecs.Service(
+        f"{name}-service",
+        name=f"wellarchitected-{name}-service",
+        cluster=ecs_cluster.arn,
+        task_definition=task_definitions[name].arn,
+        desired_count=2,
+        launch_type="FARGATE",
+        network_configuration=aws.ecs.ServiceNetworkConfigurationArgs(
+            assign_public_ip=True,
+            subnets=vpc_subnet_ids,
+            security_groups=[ecs_security_group.id],
+        ),
+        load_balancers=[aws.ecs.ServiceLoadBalancerArgs(
+            target_group_arn=target_groups[name].arn,
+            container_name=name,
+            container_port=cfg["port"],
+        )],
+        opts=pulumi.ResourceOptions(depends_on=[alb_listener]),
+    )
+    
+    # Auto Scaling Target
+    scaling_targets[name] = aws.appautoscaling.Target(
+        f"{name}-scaling-target",
+        max_capacity=10,
+        min_capacity=2,
+        resource_id=pulumi.Output.concat("service/", ecs_cluster.name, "/", services[name].name),
+        scalable_dimension="ecs:service:DesiredCount",
+        service_namespace="ecs",
+    )
+    
+    # Auto Scaling Policy - CPU
+    aws.appautoscaling.Policy(
+        f"{name}-cpu-scaling",
+        policy_type="TargetTrackingScaling",
+        resource_id=scaling_targets[name].resource_id,
+        scalable_dimension=scaling_targets[name].scalable_dimension,
+        service_namespace=scaling_targets[name].service_namespace,
+        target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
+            predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
+                predefined_metric_type="ECSServiceAverageCPUUtilization",
+            ),
+            target_value=70.0,
+            scale_in_cooldown=300,
+            scale_out_cooldown=60,
+        ),
+    )
 
-# Auto Scaling Policy for Frontend
-frontend_cpu_scaling = aws.appautoscaling.Policy(
-    "frontend-cpu-scaling",
+# Auto Scaling Policy - Memory (backend only)
+backend_memory_scaling = aws.appautoscaling.Policy(
+    "backend-memory-scaling",
     policy_type="TargetTrackingScaling",
-    resource_id=frontend_scaling_target.resource_id,
-    scalable_dimension=frontend_scaling_target.scalable_dimension,
-    service_namespace=frontend_scaling_target.service_namespace,
+    resource_id=scaling_targets["backend"].resource_id,
+    scalable_dimension=scaling_targets["backend"].scalable_dimension,
+    service_namespace=scaling_targets["backend"].service_namespace,
     target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
         predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
-            predefined_metric_type="ECSServiceAverageCPUUtilization",
+            predefined_metric_type="ECSServiceAverageMemoryUtilization",
         ),
-        target_value=70.0,
+        target_value=80.0,
         scale_in_cooldown=300,
         scale_out_cooldown=60,
     ),
@@ -602,6 +671,61 @@ cloudfront_distribution = aws.cloudfront.Distribution(
 )
 
 # WAF Web ACL for CloudFront (must be in us-east-1)
+# Rule set built once; the Web ACL below takes a copy
+_WAF_RULES = (
+    # Rate limiting rule
+    aws.wafv2.WebAclRuleArgs(
+        name="rate-limit-rule",
+        priority=1,
+        action=aws.wafv2.WebAclRuleActionArgs(block={}),
+        statement=aws.wafv2.WebAclRuleStatementArgs(
+            rate_based_statement=aws.wafv2.WebAclRuleStatementRateBasedStatementArgs(
+                limit=2000,
+                aggregate_key_type="IP",
+            )
+        ),
+        visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
+            cloudwatch_metrics_enabled=True,
+            metric_name="RateLimitRule",
+            sampled_requests_enabled=True,
+        ),
+    ),
+    # AWS Managed Rules - Core Rule Set
+    aws.wafv2.WebAclRuleArgs(
+        name="aws-managed-rules-core",
+        priority=2,
+        override_action=aws.wafv2.WebAclRuleOverrideActionArgs(none={}),
+        statement=aws.wafv2.WebAclRuleStatementArgs(
+            managed_rule_group_statement=aws.wafv2.WebAclRuleStatementManagedRuleGroupStatementArgs(
+                vendor_name="AWS",
+                name="AWSManagedRulesCommonRuleSet",
+            )
+        ),
+        visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
+            cloudwatch_metrics_enabled=True,
+            metric_name="AWSManagedRulesCore",
+            sampled_requests_enabled=True,
+        ),
+    ),
+    # AWS Managed Rules - Known Bad Inputs
+    aws.wafv2.WebAclRuleArgs(
+        name="aws-managed-rules-known-bad-inputs",
+        priority=3,
+        override_action=aws.wafv2.WebAclRuleOverrideActionArgs(none={}),
+        statement=aws.wafv2.WebAclRuleStatementArgs(
+            managed_rule_group_statement=aws.wafv2.WebAclRuleStatementManagedRuleGroupStatementArgs(
+                vendor_name="AWS",
+                name="AWSManagedRulesKnownBadInputsRuleSet",
+            )
+        ),
+        visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
+            cloudwatch_metrics_enabled=True,
+            metric_name="AWSManagedRulesKnownBadInputs",
+            sampled_requests_enabled=True,
+        ),
+    ),
+)
+
 waf_ip_set = aws.wafv2.IpSet(
     "waf-ip-set",
     name="wellarchitected-allowed-ips",
@@ -617,59 +741,7 @@ waf_web_acl = aws.wafv2.WebAcl(
     scope="CLOUDFRONT",
     opts=pulumi.ResourceOptions(provider=us_east_1_provider),
     default_action=aws.wafv2.WebAclDefaultActionArgs(allow={}),
-    rules=[
-        # Rate limiting rule
-        aws.wafv2.WebAclRuleArgs(
-            name="rate-limit-rule",
-            priority=1,
-            action=aws.wafv2.WebAclRuleActionArgs(block={}),
-            statement=aws.wafv2.WebAclRuleStatementArgs(
-                rate_based_statement=aws.wafv2.WebAclRuleStatementRateBasedStatementArgs(
-                    limit=2000,
-                    aggregate_key_type="IP",
-                )
-            ),
-            visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
-                cloudwatch_metrics_enabled=True,
-                metric_name="RateLimitRule",
-                sampled_requests_enabled=True,
-            ),
-        ),
-        # AWS Managed Rules - Core Rule Set
-        aws.wafv2.WebAclRuleArgs(
-            name="aws-managed-rules-core",
-            priority=2,
-            override_action=aws.wafv2.WebAclRuleOverrideActionArgs(none={}),
-            statement=aws.wafv2.WebAclRuleStatementArgs(
-                managed_rule_group_statement=aws.wafv2.WebAclRuleStatementManagedRuleGroupStatementArgs(
-                    vendor_name="AWS",
-                    name="AWSManagedRulesCommonRuleSet",
-                )
-            ),
-            visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
-                cloudwatch_metrics_enabled=True,
-                metric_name="AWSManagedRulesCore",
-                sampled_requests_enabled=True,
-            ),
-        ),
-        # AWS Managed Rules - Known Bad Inputs
-        aws.wafv2.WebAclRuleArgs(
-            name="aws-managed-rules-known-bad-inputs",
-            priority=3,
-            override_action=aws.wafv2.WebAclRuleOverrideActionArgs(none={}),
-            statement=aws.wafv2.WebAclRuleStatementArgs(
-                managed_rule_group_statement=aws.wafv2.WebAclRuleStatementManagedRuleGroupStatementArgs(
-                    vendor_name="AWS",
-                    name="AWSManagedRulesKnownBadInputsRuleSet",
-                )
-            ),
-            visibility_config=aws.wafv2.WebAclRuleVisibilityConfigArgs(
-                cloudwatch_metrics_enabled=True,
-                metric_name="AWSManagedRulesKnownBadInputs",
-                sampled_requests_enabled=True,
-            ),
-        ),
-    ],
+    rules=list(_WAF_RULES),
     visibility_config=aws.wafv2.WebAclVisibilityConfigArgs(
         cloudwatch_metrics_enabled=True,
         metric_name="WellArchitectedWAF",
@@ -678,57 +750,56 @@ waf_web_acl = aws.wafv2.WebAcl(
 )
 
 # CloudWatch Alarms
+# Settings every alarm below shares
+_ALARM_DEFAULTS = dict(
+    comparison_operator="GreaterThanThreshold",
+    evaluation_periods=2,
+    statistic="Average",
+)
+_BACKEND_SERVICE_DIMENSIONS = {
+    "ClusterName": ecs_cluster.name,
+    "ServiceName": services["backend"].name,
+}
+
 # Backend CPU Alarm
 backend_cpu_alarm = aws.cloudwatch.MetricAlarm(
     "backend-cpu-alarm",
     name="wellarchitected-backend-high-cpu",
-    comparison_operator="GreaterThanThreshold",
-    evaluation_periods=2,
+    **_ALARM_DEFAULTS,
     metric_name="CPUUtilization",
     namespace="AWS/ECS",
     period=300,
-    statistic="Average",
     threshold=80,
     alarm_description="Backend CPU utilization is too high",
-    dimensions={
-        "ClusterName": ecs_cluster.name,
-        "ServiceName": backend_service.name,
-    },
+    dimensions=_BACKEND_SERVICE_DIMENSIONS,
 )
 
 # Backend Memory Alarm
 backend_memory_alarm = aws.cloudwatch.MetricAlarm(
     "backend-memory-alarm",
     name="wellarchitected-backend-high-memory",
-    comparison_operator="GreaterThanThreshold",
-    evaluation_periods=2,
+    **_ALARM_DEFAULTS,
     metric_name="MemoryUtilization",
     namespace="AWS/ECS",
     period=300,
-    statistic="Average",
     threshold=85,
     alarm_description="Backend memory utilization is too high",
-    dimensions={
-        "ClusterName": ecs_cluster.name,
-        "ServiceName": backend_service.name,
-    },
+    dimensions=_BACKEND_SERVICE_DIMENSIONS,
 )
 
 # ALB Target Health Alarm
 alb_unhealthy_targets_alarm = aws.cloudwatch.MetricAlarm(
     "alb-unhealthy-targets",
     name="wellarchitected-alb-unhealthy-targets",
-    comparison_operator="GreaterThanThreshold",
-    evaluation_periods=2,
+    **_ALARM_DEFAULTS,
     metric_name="UnHealthyHostCount",
     namespace="AWS/ApplicationELB",
     period=60,
-    statistic="Average",
     threshold=0,
     alarm_description="ALB has unhealthy targets",
     dimensions={
         "LoadBalancer": alb.arn_suffix,
-        "TargetGroup": backend_target_group.arn_suffix,
+        "TargetGroup": target_groups["backend"].arn_suffix,
     },
 )
 